@@ -0,0 +1,344 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2018 by Instituto de Cálculo, http://www.ic.fcen.uba.ar/
+
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+# Coded by Saveliy Vasiliev for project 301060 (https://301060.exactas.uba.ar/)
+
+import numpy as np
+import simulator as sim
+import bracket
+import group
+import estimations as est
+import fixture_data as fd
+import config
+import sobol
+import outcomelog
+
+group_names = sim.group_names
+
+
+class BatchSimulator(sim.Simulator):
+	"""
+	Array based Simulator. Plays blocks of block_size tournaments at once with NumPy
+	and exposes the same probs_* interface as Simulator.
+	Instance callbacks are not supported since no Match/Group/DeterministicNode
+	objects are built, batch callbacks get every block instead.
+	"""
+	def __init__(self, group_matches, knockout_matches, iterations, block_size=100000, verbose=True, seed=None,
+		tolerance=None, tracked=("probs_champion", "probs_group_position"), outcome_log=None, batch_callbacks=[],
+		progress=None):
+		"""
+		block_size: iterations played at once, the tolerance is checked after each block.
+		outcome_log: a directory where the outcome of every iteration is appended,
+			see outcomelog.OutcomeWriter.
+		batch_callbacks: as in Simulator, called once per block.
+		"""
+		self._block_size = block_size
+		self._outcome_log = outcome_log
+		# Sobol points only help with the inverse CDF sampler, which keeps their spread.
+		self._scores = est.score_table() if config.qmc else est.batch_sampler()
+		self._wins = est.winning_probs()
+		super().__init__(group_matches, knockout_matches, iterations, verbose=verbose, seed=seed,
+			tolerance=tolerance, tracked=tracked, batch_callbacks=batch_callbacks, progress=progress)
+
+
+	def _run(self):
+		self._init_knockout_wins()
+		self._init_group_stage()
+		if config.qmc:
+			self._np_rng = sobol.SobolStream(self._dimension(), self._seed_sequence)
+		else:
+			self._np_rng = np.random.default_rng(self._seed_sequence)
+		self._writer = None
+		if self._outcome_log is not None:
+			self._writer = outcomelog.OutcomeWriter(self._outcome_log)
+		done = 0
+		self._update_progress(done)
+		while done < self._iterations:
+			n = min(self._block_size, self._iterations - done)
+			self._run_block(n)
+			done += n
+			self._update_progress(done)
+			if self._precise_enough(done):
+				self._iterations = done
+				self._update_progress(done)
+		if self._writer is not None:
+			self._writer.close()
+
+
+	def run(self, n, rng):
+		"""
+		Plays n more iterations, in blocks of block_size, drawing from the NumPy
+		Generator rng and adds them to the probabilities. Simulators of other known
+		matches given the same stream draw the same uniforms (see scenarios.py).
+		The tolerance is not checked.
+		"""
+		self._np_rng = rng
+		self._writer = None
+		if self._outcome_log is not None:
+			self._writer = outcomelog.OutcomeWriter(self._outcome_log)
+		for start in range(0, n, self._block_size):
+			self._run_block(min(self._block_size, n - start))
+		if self._writer is not None:
+			self._writer.close()
+		self._iterations += n
+
+
+	def _init_group_stage(self):
+		"""
+		Lays out the 48 group matches. Teams are placed in slots (group * 4 + position in
+		fd.groups) and, for each slot, _slot_rows holds the rows of its 3 matches in arrays
+		that stack the team1 values of the matches over the team2 ones.
+		"""
+		self._group_teams = np.array([[fd.team_ids[t] for t in fd.groups[g]] for g in group_names])
+		pairs = [sorted(fm) for g in group_names for fm in fd.group_pairs[g]]
+		self._match_team1 = np.array([fd.team_ids[t1] for t1, _ in pairs])
+		self._match_team2 = np.array([fd.team_ids[t2] for _, t2 in pairs])
+		self._match_group = np.array([g for g, gname in enumerate(group_names) for _ in fd.group_pairs[gname]])
+		rows = dict((team, []) for team in self._group_teams.ravel())
+		for m in range(len(pairs)):
+			rows[self._match_team1[m]].append(m)
+			rows[self._match_team2[m]].append(len(pairs) + m)
+		self._slot_rows = np.array([rows[team] for team in self._group_teams.ravel()])
+
+		self._known = {}
+		for m, (team1, team2) in enumerate(pairs):
+			if {team1, team2} in self._known_group_pairs:
+				known_match = next(km for km in self._group_matches if {km.team1, km.team2} == {team1, team2})
+				self._known[m] = (known_match.score()[team1], known_match.score()[team2])
+
+
+	def _dimension(self):
+		# uniforms drawn per iteration: group matches, tie breakers and knockout matches
+		per_match = 1 if config.knockout_mode == "winner" else 2
+		return len(self._match_team1) + self._group_teams.size + per_match * (len(bracket.wiring) + 1)
+
+
+	def _group_goals(self, n, rng):
+		"""
+		Returns the (2 * matches, n) array of the goals of the group matches, the goals
+		of the first teams of the matches stacked over those of the second ones.
+		"""
+		n_matches = len(self._match_team1)
+		goals = np.empty((2 * n_matches, n), dtype=np.int8)
+		for m in range(n_matches):
+			# Known matches draw their uniforms too, so that the draws of every match are
+			# the same in runs with other known matches (see scenarios.py).
+			u = rng.random(n)
+			if m in self._known:
+				goals[m], goals[n_matches + m] = self._known[m]
+			else:
+				goals[m], goals[n_matches + m] = self._scores.sample(self._match_team1[m], self._match_team2[m], u)
+		return goals
+
+
+	def _group_rankings(self, goals, rng, groups=slice(None)):
+		"""
+		Returns an (n, groups, 4) array with the team ids sorted by final position.
+		groups: a slice of the groups (as indices of group_names) to rank, all by default.
+		"""
+		n = goals.shape[1]
+		slot_rows = self._slot_rows.reshape(len(group_names), 4, -1)[groups].reshape(-1, self._slot_rows.shape[1])
+		group_teams = self._group_teams[groups]
+		goal_diffs = goals - np.roll(goals, len(self._match_team1), axis=0)
+		points = 3 * (goal_diffs > 0).view(np.int8) + (goal_diffs == 0)
+		# Same criteria as Group._group_sort_key, the uniform breaks the remaining ties.
+		key = group.sort_key(points[slot_rows].sum(axis=1, dtype=np.int32),
+			goal_diffs[slot_rows].sum(axis=1, dtype=np.int32),
+			goals[slot_rows].sum(axis=1, dtype=np.int32))
+		key = key + rng.random(key.shape)
+		order = np.argsort(-key.T.reshape(n, len(group_teams), 4), axis=2)
+		return np.take_along_axis(np.broadcast_to(group_teams, order.shape), order, axis=2)
+
+
+	def _init_knockout_wins(self):
+		# node -> matrix of P(team1 beats team2) at node, 0 or 1 for the played matches
+		self._node_wins = {}
+		for node, _, _ in bracket.wiring + [("ThirdPlace", None, None)]:
+			self._node_wins[node] = self._wins
+			if node in self._knockout_matches:
+				known_match = self._knockout_matches[node]
+				winner, loser = fd.team_ids[known_match.winner()], fd.team_ids[known_match.loser()]
+				self._node_wins[node] = self._wins.copy()
+				self._node_wins[node][winner, loser], self._node_wins[node][loser, winner] = 1, 0
+
+
+	def _play_node(self, node, team1, team2, rng, strict=True, goals=None):
+		"""
+		Returns (winners, valid) of the knockout match at node for every iteration.
+		valid is False where a played match is reached by other teams, which raises
+		an exception if strict.
+		goals: a (2, n) array that gets the goals of team1 and team2 when there is a
+			score (the match is known or config.knockout_mode is "score").
+		"""
+		if node in self._knockout_matches:
+			# same uniforms as an unknown match, as in _group_goals
+			rng.random((1 if config.knockout_mode == "winner" else 2, len(team1)))
+			known_match = self._knockout_matches[node]
+			if not known_match.knockout:
+				raise Exception("A match that can be drawn was loaded into knockout phase. This is not acceptable.")
+			k1, k2 = fd.team_ids[known_match.team1], fd.team_ids[known_match.team2]
+			valid = ((team1 == k1) & (team2 == k2)) | ((team1 == k2) & (team2 == k1))
+			if strict and not np.all(valid):
+				raise Exception("The simulation arrived at a situation when " +
+					"a loaded match isn't the played one. Check for previous matches for {}. ".format(node) +
+					"Match loaded = {}".format(str(known_match)))
+			if goals is not None:
+				score = known_match.score()
+				first = team1 == k1
+				goals[0] = np.where(first, score[known_match.team1], score[known_match.team2])
+				goals[1] = np.where(first, score[known_match.team2], score[known_match.team1])
+			return np.full(len(team1), fd.team_ids[known_match.winner()]), valid
+		valid = np.ones(len(team1), dtype=bool)
+		if config.knockout_mode == "winner":
+			team1_wins = rng.random(len(team1)) < self._wins[team1, team2]
+			return np.where(team1_wins, team1, team2), valid
+		g1, g2 = self._scores.sample(team1, team2, rng.random(len(team1)))
+		if goals is not None:
+			goals[0], goals[1] = g1, g2
+		# penalties are a coin flip, as in Match._define_winner_and_loser
+		team1_wins = (g1 > g2) | ((g1 == g2) & (rng.random(len(team1)) < 0.5))
+		return np.where(team1_wins, team1, team2), valid
+
+
+	def _play_knockout(self, rankings, rng, knockout=None, start=0, strict=True, goals=None):
+		"""
+		Plays the knockout stage for the (n, groups, 4) rankings. Returns (knockout, valid):
+		knockout is a (nodes + 1, n) array with the winners of the nodes in bracket.wiring
+		followed by the winner of the third place, valid is as in _play_node. When
+		knockout is given only its nodes from start on are played again.
+		goals: a (2, nodes + 1, n) array for the scores of the matches, see _play_node.
+		"""
+		if knockout is None:
+			knockout = np.empty((len(bracket.wiring) + 1, len(rankings)), dtype=np.int64)
+		winners = _leaf_winners(rankings)
+		valid = np.ones(len(rankings), dtype=bool)
+		for k, (node, child1, child2) in enumerate(bracket.wiring):
+			if k >= start:
+				knockout[k], node_valid = self._play_node(node, winners[child1], winners[child2], rng, strict,
+					None if goals is None else goals[:, k])
+				valid &= node_valid
+			winners[node] = knockout[k]
+		knockout[-1], node_valid = self._play_node("ThirdPlace", _loser(winners, "SF1"), _loser(winners, "SF2"), rng, strict,
+			None if goals is None else goals[:, -1])
+		return knockout, valid & node_valid
+
+
+	def _run_block(self, n):
+		rng = self._np_rng
+		goals = self._group_goals(n, rng)
+		rankings = self._group_rankings(goals, rng)
+		if self._writer is None and not self._batch_callbacks:
+			knockout, _ = self._play_knockout(rankings, rng)
+		else:
+			knockout_goals = np.full((2, len(bracket.wiring) + 1, n), -1, dtype=np.int8)
+			knockout, _ = self._play_knockout(rankings, rng, goals=knockout_goals)
+			block = outcomelog.OutcomeBlock(rankings, goals.reshape(2, -1, n).transpose(2, 1, 0),
+				knockout_goals.transpose(2, 1, 0), knockout.T, _knockout_losers(rankings, knockout).T)
+			if self._writer is not None:
+				self._writer.append(block)
+			for callback in self._batch_callbacks:
+				callback(block)
+		self._count_block(rankings, knockout)
+
+
+	def _count_block(self, rankings, knockout):
+		"""
+		Adds the iterations with the given rankings and knockout (see _play_knockout) to the counters.
+		"""
+		n_teams = len(fd.teams)
+		winners = _leaf_winners(rankings)
+		# node -> (team1, team2, P(team1 wins)) of its match
+		played = {}
+		for k, (node, child1, child2) in enumerate(bracket.wiring):
+			team1, team2 = winners[child1], winners[child2]
+			winners[node] = knockout[k]
+			played[node] = (team1, team2, self._node_wins[node][team1, team2])
+			k = sim.node_index[node]
+			if config.rao_blackwell and child1 in played:
+				# Who reaches node is counted with the probabilities of winning the matches
+				# of its children instead of their sampled winners.
+				(a, b, pa), (c, d, pc) = played[child1], played[child2]
+				self._team_in_node_count[k] += (np.bincount(a, pa, n_teams) + np.bincount(b, 1 - pa, n_teams)
+					+ np.bincount(c, pc, n_teams) + np.bincount(d, 1 - pc, n_teams))
+				pairs = sum(np.bincount(x * n_teams + y, px * py, n_teams * n_teams)
+					for x, px in [(a, pa), (b, 1 - pa)] for y, py in [(c, pc), (d, 1 - pc)])
+			else:
+				self._team_in_node_count[k] += np.bincount(team1, minlength=n_teams) + np.bincount(team2, minlength=n_teams)
+				pairs = np.bincount(team1 * n_teams + team2, minlength=n_teams * n_teams)
+			pairs = pairs.reshape(n_teams, n_teams)
+			self._teams_in_node_count[k] += pairs + pairs.T
+
+		if config.rao_blackwell:
+			team1, team2, p = played["Final"]
+			self._champion_count += np.bincount(team1, p, n_teams) + np.bincount(team2, 1 - p, n_teams)
+			self._second_place_count += np.bincount(team1, 1 - p, n_teams) + np.bincount(team2, p, n_teams)
+			team1, team2 = _loser(winners, "SF1"), _loser(winners, "SF2")
+			p = self._node_wins["ThirdPlace"][team1, team2]
+			self._third_place_count += np.bincount(team1, p, n_teams) + np.bincount(team2, 1 - p, n_teams)
+		else:
+			self._champion_count += np.bincount(winners["Final"], minlength=n_teams)
+			self._second_place_count += np.bincount(_loser(winners, "Final"), minlength=n_teams)
+			self._third_place_count += np.bincount(knockout[-1], minlength=n_teams)
+		for pos in range(4):
+			self._team_in_group_position[:, pos] += np.bincount(rankings[:, :, pos].ravel(), minlength=n_teams)
+
+
+def _leaf_winners(rankings):
+	# label -> team ids in that leaf of the bracket, for the (n, groups, 4) rankings
+	winners = {}
+	for g, gname in enumerate(group_names):
+		winners[gname + "1"] = rankings[:, g, 0]
+		winners[gname + "2"] = rankings[:, g, 1]
+	return winners
+
+
+def _loser(winners, node):
+	# the team that lost the match at node, winners as filled by _play_knockout
+	child1, child2 = _children[node]
+	return np.where(winners[node] == winners[child1], winners[child2], winners[child1])
+
+
+def _knockout_losers(rankings, knockout):
+	# (nodes + 1, n) array with the losers of the matches in knockout (see _play_knockout)
+	winners = _leaf_winners(rankings)
+	losers = np.empty_like(knockout)
+	for k, (node, _, _) in enumerate(bracket.wiring):
+		winners[node] = knockout[k]
+		losers[k] = _loser(winners, node)
+	third1, third2 = _loser(winners, "SF1"), _loser(winners, "SF2")
+	losers[-1] = np.where(knockout[-1] == third1, third2, third1)
+	return losers
+
+
+_children = dict((node, (child1, child2)) for node, child1, child2 in bracket.wiring)
+
+
+if __name__ == '__main__':
+	import time
+	start = time.time()
+	bsim = BatchSimulator([], {}, config.iterations)
+	print("{} iterations in {:.2f}s".format(config.iterations, time.time() - start))
+	pchamp = bsim.probs_champion()
+	for team in sorted(pchamp, key=pchamp.get, reverse=True)[:8]:
+		print("Prob_champion({}) = {:.4f}".format(team, pchamp[team]))
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2018 by Instituto de Cálculo, http://www.ic.fcen.uba.ar/
+
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+# Coded by Saveliy Vasiliev for project 301060 (https://301060.exactas.uba.ar/)
+
+"""
+Micro benchmarks. Run as: python3 benchmarks.py [name ...] (all of them by default).
+"""
+
+import os
+import sys
+import time
+import random
+import subprocess
+import numpy as np
+import estimations as est
+import fixture_data as fd
+import config
+
+
+def _report(name, seconds, draws):
+	print("{0:<40} {1:>10.1f} ns/draw".format(name, seconds / draws * 1e9))
+
+
+def bench_samplers(draws=200000, batch=1000000):
+	"""
+	Scalar linear scan vs scalar alias draws, and batched searchsorted vs batched alias draws.
+	"""
+	pairs = est.table().pairs()
+	picked = [random.choice(pairs) for _ in range(draws)]
+
+	sampler = config.sampler
+	for config.sampler, name in [("cdf", "scan"), ("alias", "alias")]:
+		start = time.perf_counter()
+		for team1, team2 in picked:
+			est.random_score(team1, team2)
+		_report("scalar {} (random_score)".format(name), time.perf_counter() - start, draws)
+	config.sampler = sampler
+
+	rng = np.random.default_rng()
+	team1 = rng.integers(len(fd.teams), size=batch)
+	team2 = (team1 + rng.integers(1, len(fd.teams), size=batch)) % len(fd.teams)
+	for name, table in [("searchsorted", est.score_table()), ("alias", est.alias_table())]:
+		u = rng.random(batch)
+		start = time.perf_counter()
+		table.sample(team1, team2, u)
+		_report("batched {} (mixed pairs)".format(name), time.perf_counter() - start, batch)
+		start = time.perf_counter()
+		table.sample(team1[0], team2[0], u)
+		_report("batched {} (fixed pair)".format(name), time.perf_counter() - start, batch)
+
+
+def bench_qmc(sizes=(2 ** 12, 2 ** 14, 2 ** 16, 2 ** 18), repetitions=4):
+	"""
+	Root mean square error of probs_champion and probs_group_position against their
+	exact values, with pseudo-random numbers (config.qmc = False) and Sobol points,
+	after the first two matchdays (drawn with a fixed seed) so that ExactKnockout
+	gives the exact values.
+	"""
+	import match
+	import batchsimulator as bsim
+	import exactknockout as ek
+	rng = random.Random(2018)
+	group_matches = []
+	for gname in sorted(fd.groups):
+		for team1, team2 in sorted(sorted(pair) for pair in fd.group_pairs[gname])[:3]:
+			score = est.random_score(team1, team2, rng)
+			group_matches.append(match.Match(team1, team2, score[team1], score[team2]))
+	exact = ek.ExactKnockout(group_matches)
+	champion = np.array([exact.probs_champion()[team] for team in fd.teams])
+	positions = exact.probs_group_position()
+
+	qmc = config.qmc
+	for config.qmc, name in [(False, "random"), (True, "sobol")]:
+		for n in sizes:
+			errors = []
+			start = time.perf_counter()
+			for seed in range(repetitions):
+				simulator = bsim.BatchSimulator(group_matches, {}, n, block_size=min(n, 2 ** 16), verbose=False, seed=seed)
+				probs = simulator.probs_group_position()
+				errors.append((
+					np.array([simulator.probs_champion()[team] for team in fd.teams]) - champion,
+					np.array([probs[g][t][p] - positions[g][t][p] for g in probs for t in probs[g] for p in probs[g][t]])))
+			print("{0:<8} {1:>8} iterations: rmse champion {2:.2e}, group positions {3:.2e} ({4:.2f}s per run)".format(
+				name, n, np.sqrt(np.mean([e[0] ** 2 for e in errors])), np.sqrt(np.mean([e[1] ** 2 for e in errors])),
+				(time.perf_counter() - start) / repetitions))
+	config.qmc = qmc
+
+
+def bench_startup(repetitions=5):
+	"""
+	Wall time of fresh interpreters importing what a cache hit of CachableSimulator
+	needs (the TournamentState key of some known matches and pymongo for the query, which isn't run),
+	and what a simulation needs on top of it, with the heavy modules each one loads.
+	"""
+	steps = [
+		("cache key", "import cachablesimulator, matchloader, match, config, tournamentstate as ts; "
+			"ts.TournamentState([match.Match('RUS', 'KSA', 5, 0), match.Match('EGY', 'URU', 0, 1)], {}, config.iterations).digest()"),
+		("cache key + pymongo", "import cachablesimulator, match, config, tournamentstate as ts, pymongo; "
+			"ts.TournamentState([match.Match('RUS', 'KSA', 5, 0)], {}, config.iterations).digest()"),
+		("simulation", "import cachablesimulator, batchsimulator, exactknockout, pymongo, estimations; estimations.score_table()"),
+	]
+	heavy = ["numpy", "pymongo", "estimations_data", "simulator"]
+	for name, code in steps:
+		script = ("import sys, time\nstart = time.perf_counter()\n{}\n"
+			"print(time.perf_counter() - start, *[m for m in {!r} if m in sys.modules])").format(code, heavy)
+		runs = []
+		for _ in range(repetitions):
+			output = subprocess.run([sys.executable, "-c", script], check=True, capture_output=True, text=True,
+				cwd=os.path.dirname(os.path.abspath(__file__))).stdout.split()
+			runs.append(float(output[0]))
+		print("{0:<40} {1:>8.1f} ms (loads: {2})".format(name, sorted(runs)[len(runs) // 2] * 1e3, ", ".join(output[1:]) or "-"))
+
+
+def bench_progress(updates=1000000, iterations=5000):
+	"""
+	Cost of a progress update that doesn't report (the common case in the loops), and
+	the object Simulator with no progress against a bar written to memory.
+	"""
+	import io
+	import progress as prg
+	import simulator as sim
+	stream = io.StringIO()
+	progress = prg.Progress(prg.TerminalBar(stream))
+	start = time.perf_counter()
+	for i in range(updates):
+		progress.update(i, updates, lambda: 0.0)
+	seconds = time.perf_counter() - start
+	print("{0:<40} {1:>10.1f} ns/update ({2} reports)".format("Progress.update", seconds / updates * 1e9,
+		stream.getvalue().count("\r")))
+	for name, reporter in [("none", "none"), ("bar", prg.TerminalBar(io.StringIO()))]:
+		start = time.perf_counter()
+		sim.Simulator([], {}, iterations, seed=1, progress=reporter)
+		print("{0:<40} {1:>10.1f} us/iteration".format("Simulator, progress " + name,
+			(time.perf_counter() - start) / iterations * 1e6))
+
+
+def bench_matches(matches=100000):
+	"""
+	Playing group matches as Match objects (as Simulator used to) vs MatchResult
+	records: time per match and memory held by each played match.
+	"""
+	import tracemalloc
+	import match
+	rng = random.Random(1)
+	pairs = [random.choice(est.table().pairs()) for _ in range(matches)]
+
+	def as_match(team1, team2):
+		m = match.Match(team1, team2, rng=rng)
+		m.winner()
+		return m
+
+	def as_record(team1, team2):
+		goals1, goals2 = est.random_goals(team1, team2, rng)
+		return match.MatchResult(team1, team2, goals1, goals2)
+
+	for name, play in [("Match", as_match), ("MatchResult", as_record)]:
+		start = time.perf_counter()
+		played = [play(team1, team2) for team1, team2 in pairs]
+		seconds = time.perf_counter() - start
+		del played
+		tracemalloc.start()
+		played = [play(team1, team2) for team1, team2 in pairs]
+		size = tracemalloc.get_traced_memory()[0]
+		tracemalloc.stop()
+		print("{0:<40} {1:>10.1f} ns/match {2:>6.0f} bytes/match".format(name, seconds / matches * 1e9, size / matches))
+
+
+benchmarks = {
+	"samplers": bench_samplers,
+	"qmc": bench_qmc,
+	"startup": bench_startup,
+	"progress": bench_progress,
+	"matches": bench_matches,
+}
+
+
+if __name__ == '__main__':
+	for name in sys.argv[1:] or benchmarks:
+		print("== {}".format(name))
+		benchmarks[name]()
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2018 by Instituto de Cálculo, http://www.ic.fcen.uba.ar/
+
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+# Coded by Saveliy Vasiliev for project 301060 (https://301060.exactas.uba.ar/)
+
+import random
+import estimations as est
+import fixture_data as fd
+
+leaves = ["A1","A2","B1","B2","C1","C2","D1","D2","E1","E2","F1","F2","G1","G2","H1","H2"]
+
+# Knockout nodes in the order they must be resolved: (node, child1, child2).
+wiring = [
+	("S1", "A1", "B2"), ("S2", "C1", "D2"), ("S3", "B1", "A2"), ("S4", "D1", "C2"),
+	("S5", "E1", "F2"), ("S6", "G1", "H2"), ("S7", "F1", "E2"), ("S8", "H1", "G2"),
+	("Q1", "S1", "S2"), ("Q2", "S5", "S6"), ("Q3", "S3", "S4"), ("Q4", "S7", "S8"),
+	("SF1", "Q1", "Q2"), ("SF2", "Q3", "Q4"),
+	("Final", "SF1", "SF2")
+	]
+
+labels = leaves + [node for node, _, _ in wiring]
+
+
+class CompiledBracket(object):
+	"""
+	The knockout stage as flat lists of slots, indexed as in labels: the leaves first
+	and then the nodes in topological order, followed by the third place match.
+	It is built once per simulation and resolve() plays a whole knockout stage with
+	a loop over the slots, reusing the same lists every time.
+	After resolve(), team1/team2/goals1/goals2/winners/losers hold the result of every
+	node (for leaves, winners holds the team). Teams are team ids.
+	"""
+	def __init__(self, knockout_matches, scores=True):
+		"""
+		knockout_matches: {slot_label: match} of already played matches, with team ids.
+		scores: False only draws the winner of each match, with est.winning_probs(),
+			and leaves the goals of the matches not played as None.
+		"""
+		self._wins = None if scores else est.winning_probs().tolist()
+		self.labels = labels + ["ThirdPlace"]
+		self.third_place = len(labels)
+		index = dict((label, k) for k, label in enumerate(labels))
+		self.child1 = [None] * len(leaves) + [index[child1] for _, child1, _ in wiring] + [index["SF1"]]
+		self.child2 = [None] * len(leaves) + [index[child2] for _, _, child2 in wiring] + [index["SF2"]]
+		self.pinned = [None] * len(self.labels)
+		for k in range(len(leaves), len(self.labels)):
+			known_match = knockout_matches.get(self.labels[k])
+			if known_match is not None:
+				if not known_match.knockout:
+					raise Exception("A match that can be drawn was loaded into knockout phase. This is not acceptable.")
+				self.pinned[k] = known_match
+		self.team1 = [None] * len(self.labels)
+		self.team2 = [None] * len(self.labels)
+		self.goals1 = [None] * len(self.labels)
+		self.goals2 = [None] * len(self.labels)
+		self.winners = [None] * len(self.labels)
+		self.losers = [None] * len(self.labels)
+
+	def resolve(self, leaf_teams, rng=random):
+		"""
+		Plays the knockout stage for the teams in the leaves (in the order of leaves).
+		rng: random.Random used for the matches, defaults to the random module.
+		"""
+		child1, child2, pinned = self.child1, self.child2, self.pinned
+		team1, team2, goals1, goals2 = self.team1, self.team2, self.goals1, self.goals2
+		winners, losers = self.winners, self.losers
+		winners[:len(leaves)] = leaf_teams
+		for k in range(len(leaves), len(self.labels)):
+			# The third place is played by the losers of the semifinals.
+			source = losers if k == self.third_place else winners
+			t1 = team1[k] = source[child1[k]]
+			t2 = team2[k] = source[child2[k]]
+			known_match = pinned[k]
+			if known_match is None and self._wins is not None:
+				g1 = g2 = None
+				team1_wins = rng.random() < self._wins[t1][t2]
+			elif known_match is None:
+				g1, g2 = est.random_goals(t1, t2, rng)
+				# penalties are a coin flip, as in Match._define_winner_and_loser
+				team1_wins = g1 > g2 or (g1 == g2 and rng.random() < 0.5)
+			else:
+				if {t1, t2} != {known_match.team1, known_match.team2}:
+					raise Exception("The simulation arrived at a situation when " +
+						"a loaded match isn't the played one. Check for previous matches for {}. ".format(self.labels[k]) +
+						"Teams reached by simulation: {} vs {}.".format(fd.teams[t1], fd.teams[t2]))
+				score = known_match.score()
+				g1, g2 = score[t1], score[t2]
+				team1_wins = known_match.winner() == t1
+			goals1[k], goals2[k] = g1, g2
+			if team1_wins:
+				winners[k], losers[k] = t1, t2
+			else:
+				winners[k], losers[k] = t2, t1
@@ -24,35 +24,40 @@
 
 # Coded by Saveliy Vasiliev for project 301060 (https://301060.exactas.uba.ar/)
 
+# Only what a cache hit needs is imported here: the simulators (and NumPy) are
+# imported when a simulation has to run and pymongo when the database is first used.
 import match
 import deterministicnode as dnode
 import group
-import estimations as est
 import fixture_data as fd
 import pprint
-import hashlib
-import simulator as sim
-from pymongo import MongoClient
+import os
 import sys
 import config
-import logging
+import logs
+import tournamentstate as ts
 
-logger = logging.getLogger(__name__)
-logger.setLevel(logging.DEBUG)
+logger = logs.module_logger(__name__, 'log/cachablesimulator.log')
 
-formatter = logging.Formatter("%(asctime)s:%(levelname)s:%(name)s:%(filename)s(%(lineno)d):%(funcName)s:%(message)s")
-stream_formatter = logging.Formatter("%(levelname)s:%(message)s")
 
-file_handler = logging.FileHandler('log/cachablesimulator.log')
-file_handler.setFormatter(formatter)
-file_handler.setLevel(config.file_logging_level)
+def engine(name):
+	"""
+	The simulator class of an engine of config.engine ("object" or "batch").
+	"""
+	if name == "object":
+		import simulator as sim
+		return sim.Simulator
+	if name == "batch":
+		import batchsimulator as bsim
+		return bsim.BatchSimulator
+	raise KeyError(name)
+
 
-stream_handler = logging.StreamHandler()
-stream_handler.setLevel(config.stream_logging_level)
-stream_handler.setFormatter(stream_formatter)
+def mongo_client():
+	# a new client of the local database
+	import pymongo
+	return pymongo.MongoClient('mongodb://localhost:27017/')
 
-logger.addHandler(file_handler)
-logger.addHandler(stream_handler)
 
 class CachableSimulator(object):
 	"""
@@ -75,13 +80,11 @@ class CachableSimulator(object):
 		round_f = ["Final"]
 		ko_node_labels = round_leaves + round2 + round_qf + round_sf + round_f
 
-		group_hash = self._hash_match_list(group_matches)
-		ko_hash = self._hash_match_dicc(knockout_matches)
-		iterations_hash = self._iterations_hash(config.iterations)
-		self._hash = (group_hash + ko_hash + iterations_hash) % 100000000000000000
+		self._state = ts.TournamentState(group_matches, knockout_matches, config.iterations,
+			tolerance=config.tolerance, tracked=config.tracked)
+		self._hash = self._state.digest()
 
-		logger.debug("Group hash:     {}".format(group_hash))
-		logger.debug("Knockout hash:  {}".format(ko_hash))
+		logger.debug("Tournament state: {}".format(self._state.canonical()))
 		logger.debug("Simulation hash:{}".format(self._hash))
 		simdata = self._get_simulation_from_db()
 		if simdata:
@@ -90,32 +93,99 @@ class CachableSimulator(object):
 		else:
 			logger.info("Simulation is not pre-computed. Will simulate now, this will take a while.")
 			try:
-				simulator = sim.Simulator(group_matches, knockout_matches, iterations=config.iterations)
+				simulator = self._simulate(group_matches, knockout_matches)
 				logger.info("Simulation completed. Saving into DB.")
 				self._populate_data_from_simulator(simulator)
+				if config.exact_groups and simulator.iterations() is not None:
+					self._use_exact_groups(group_matches)
 				self._save()
 			except Exception as e:
 				logger.exception("Could not run the simulation.")
 				sys.exit()
 
 
-	def _hash_match_list(self, ms):
-		return sum([hash(m) for m in ms])
-
-	def _iterations_hash(self, iterations):
-		return int(hashlib.md5(iterations.to_bytes(4, 'big')).hexdigest(), 16) & 0xffffffffffffffff
-
-	def _hash_match_dicc(self, d):
-		return sum([(
-			int(hashlib.md5((slot + str(hash(match))).encode()).hexdigest(), 16) 
-			& 0xffffffffffffffff)
-			for slot, match in d.items()
-			])
+	def _simulate(self, group_matches, knockout_matches):
+		import exactknockout as ek
+		import parallelsimulator as psim
+		# group_cache takes precedence over exact_knockout, engine and processes, unless there is a
+		# tolerance: the groups are sampled with a fixed number of draws and no precision
+		if config.group_cache and config.tolerance is not None:
+			logger.info("Not using the group cache, it can't stop at a tolerance.")
+		elif config.group_cache:
+			logger.info("Solving the groups through the group cache and the knockout stage exactly.")
+			return ek.ExactKnockout(group_matches, knockout_matches, group_stage=self._group_blocks(group_matches))
+		if config.exact_knockout:
+			try:
+				simulator = ek.ExactKnockout(group_matches, knockout_matches)
+				logger.info("Computing the tournament exactly.")
+				return simulator
+			except ValueError:
+				logger.debug("Group stage can't be enumerated, simulating.")
+		if config.engine == "incremental":
+			logger.info("Conditioning the iterations in {} (incremental engine).".format(config.outcomes_file))
+			return self._simulate_incrementally(group_matches, knockout_matches)
+		if config.processes > 1:
+			logger.info("Simulating with the {} engine on {} processes.".format(config.engine, config.processes))
+			return psim.ParallelSimulator(group_matches, knockout_matches, config.iterations,
+				processes=config.processes, engine=engine(config.engine), seed=config.seed,
+				tolerance=config.tolerance, tracked=config.tracked)
+		logger.info("Simulating with the {} engine.".format(config.engine))
+		return engine(config.engine)(group_matches, knockout_matches, iterations=config.iterations, seed=config.seed,
+			tolerance=config.tolerance, tracked=config.tracked)
+
+
+	def _simulate_incrementally(self, group_matches, knockout_matches):
+		# Conditions the iterations of the previous run, kept in config.outcomes_file, on the known matches.
+		import incrementalsimulator as isim
+		outcomes = config.outcomes_file if os.path.exists(config.outcomes_file) else None
+		simulator = isim.IncrementalSimulator(group_matches, knockout_matches, config.iterations,
+			outcomes=outcomes, seed=config.seed, tolerance=config.tolerance, tracked=config.tracked)
+		simulator.save(config.outcomes_file)
+		return simulator
+
+
+	def _group_blocks(self, group_matches):
+		"""
+		The ranking distributions of the groups, taken from the group_outcomes collection
+		when a group with the same known matches was already solved with the same
+		estimated probabilities (see tournamentstate.tables_digest). The missing ones
+		are solved (sampled with config.iterations draws if needed) and saved.
+		"""
+		import numpy as np
+		import groupcache as gc
+		rankings = {}
+		try:
+			mdb_client = mongo_client()
+			collection = mdb_client.worldcup18.group_outcomes
+			for k, gname in enumerate(sorted(fd.groups)):
+				key = gc.group_key(gname, group_matches)
+				doc = collection.find_one({"key": key, "tables": self._state.tables,
+					"$or": [{"exact": True}, {"samples": config.iterations}]})
+				if doc:
+					logger.debug("Group outcomes for {} exist at DB.".format(key))
+					rankings[gname] = doc["rankings"]
+					continue
+				logger.info("Solving group outcomes for {}.".format(key))
+				seed = np.random.SeedSequence(config.seed, spawn_key=(k,))
+				rankings[gname], exact = gc.solve_group(gname, group_matches, config.iterations, seed=seed)
+				collection.insert_one({
+					"key": key,
+					"tables": self._state.tables,
+					"samples": config.iterations,
+					"exact": exact,
+					"seed": str(seed.entropy),
+					"rankings": rankings[gname]
+					})
+			mdb_client.close()
+		except Exception as e:
+			logger.exception("Could not obtain group outcomes from database.")
+			sys.exit()
+		return gc.GroupBlocks(rankings)
 
 
 	def _get_simulation_from_db(self):
 		try:
-			mdb_client = MongoClient('mongodb://localhost:27017/')
+			mdb_client = mongo_client()
 			db = mdb_client.worldcup18
 			collection = db.simulations
 			simdata = collection.find_one({"hash" : self._hash})
@@ -127,6 +197,9 @@ class CachableSimulator(object):
 
 
 	def _populate_data_from_simulator(self, sim):
+		self._seed = sim.seed()
+		self._iterations = sim.iterations()
+		self._precision = sim.precision()
 		self._probs_reaching_node = sim.probs_reaching_node()
 		self._probs_pair_playing_at_node = sim.probs_pair_playing_at_node()
 		self._probs_group_position = sim.probs_group_position()
@@ -136,7 +209,20 @@ class CachableSimulator(object):
 		return
 
 
+	def _use_exact_groups(self, group_matches):
+		# Replaces the simulated positions of the groups with few matches left by their exact values.
+		import exactgroup as eg
+		exact = eg.ExactGroupStage(group_matches, samples=0).probs_group_position()
+		for gname in exact:
+			logger.debug("Using exact positions for group {}.".format(gname))
+			self._probs_group_position[gname] = exact[gname]
+
+
 	def _populate_data_from_query_result(self, qresult):
+		# Exact results and simulations stored before seeds were recorded don't have one.
+		self._seed = int(qresult["seed"]) if qresult.get("seed") is not None else None
+		self._iterations = qresult.get("iterations")
+		self._precision = qresult.get("precision")
 		self._probs_reaching_node = qresult["probs_reaching_node"]
 		self._probs_pair_playing_at_node = qresult["probs_pair_playing_at_node"]
 		self._probs_group_position = qresult["probs_group_position"]
@@ -148,11 +234,14 @@ class CachableSimulator(object):
 
 	def _save(self):
 		try:
-			mdb_client = MongoClient('mongodb://localhost:27017/')
+			mdb_client = mongo_client()
 			db = mdb_client.worldcup18
 			collection = db.simulations
 			collection.insert_one({
 				"hash" : self._hash, 
+				"seed": None if self._seed is None else str(self._seed), # may not fit in a 64 bits integer
+				"iterations": self._iterations,
+				"precision": self._precision,
 				"probs_reaching_node": self.probs_reaching_node(),
 				"probs_pair_playing_at_node": self.probs_pair_playing_at_node(),
 				"probs_group_position": self.probs_group_position(),
@@ -165,6 +254,17 @@ class CachableSimulator(object):
 			logger.exception("Could not save simulation to database.")
 			sys.exit()
 
+	def seed(self):
+		return self._seed
+
+	def iterations(self):
+		# None for exact results or simulations stored before iterations were recorded
+		return self._iterations
+
+	def precision(self):
+		# half-width of the widest confidence interval of the tracked probabilities (see Simulator.precision)
+		return self._precision
+
 	def probs_reaching_node(self):
 		return self._probs_reaching_node
 
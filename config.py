@@ -26,3 +26,41 @@ import logging
 file_logging_level = logging.INFO
 stream_logging_level = logging.INFO
 iterations = 1000000
+# With a tolerance, simulations stop once the 95% confidence intervals of the probabilities of the
+# tracked probs_* methods are narrower than +-tolerance, iterations being the maximum.
+tolerance = None
+tracked = ["probs_champion", "probs_group_position"]
+# "batch" runs the NumPy engine in batchsimulator.py, "object" the original Simulator and
+# "incremental" the IncrementalSimulator, which reuses the iterations of the previous run.
+engine = "batch"
+# Where the incremental engine keeps its iterations between runs.
+outcomes_file = "outcomes.npz"
+# Score sampler: "cdf" searches the accumulated probabilities, "alias" uses alias tables.
+sampler = "cdf"
+# BatchSimulator draws scrambled Sobol points instead of pseudo-random numbers (needs SciPy).
+qmc = False
+# Processes used by CachableSimulator, more than 1 runs a ParallelSimulator.
+processes = 1
+# Seed of the simulations run by CachableSimulator, None draws a fresh one. It is saved with each simulation.
+seed = None
+# CachableSimulator computes exactly the positions of the groups with few matches left (see exactgroup.py).
+exact_groups = True
+# Knockout matches: "winner" only draws who goes through, "score" draws the whole score.
+knockout_mode = "winner"
+# BatchSimulator counts the probability of winning each knockout match instead of its sampled
+# winner (Rao-Blackwellization), which has the same mean and less variance.
+rao_blackwell = True
+# CachableSimulator computes the whole tournament exactly, instead of simulating it, when all the
+# groups have few matches left (see exactknockout.py).
+exact_knockout = True
+# CachableSimulator solves and caches every group on its own, keyed by its known matches, and
+# puts the knockout stage together exactly from them (see groupcache.py). It takes precedence over
+# exact_knockout, engine and processes, which are only used when it is False or a tolerance is set.
+group_cache = True
+# How the simulations report their progress: "bar" (on the terminal, "log" when stdout isn't one),
+# "log" (to log/progress.log) or "none". At most one report every progress_interval seconds.
+progress = "bar"
+progress_interval = 0.5
+# The estimated probabilities of the results (estimations.EstimationTable), without the .npy/.teams
+# extensions and relative to the code. Rebuilt from estimations_data.py when missing.
+estimations_file = "estimations"
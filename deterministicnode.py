@@ -32,11 +32,12 @@ class DeterministicNode(object):
 	Placeholder in the fixture. 
 	This is used for modeling the knockout stage.
 	"""
-	def __init__(self, id, fn_team=None, fn1=None, fn2=None):
+	def __init__(self, id, fn_team=None, fn1=None, fn2=None, rng=None):
 		"""
 		Instantiate either with {fn} or {fn1, fn2}.
 		fn is the leaf node (name of the team).
 		fn1 and fn2 are the children nodes (DeterministicNode).
+		rng is the random.Random used for playing the match, defaults to the random module (see Match).
 		"""
 		if not (
 			(fn_team is None and (fn1 is not None and fn2 is not None)) or
@@ -51,6 +52,7 @@ class DeterministicNode(object):
 		self._loser = None
 		self.id = id
 		self._match = None
+		self._rng = rng
 
 	def _execute(self):
 		if self._winner is not None:
@@ -58,7 +60,7 @@ class DeterministicNode(object):
 		team1 = self._fn1.winner()
 		team2 = self._fn2.winner()
 		if self._match is None:
-			self._match = match.Match(team1, team2, id=self.id, knockout=True)
+			self._match = match.Match(team1, team2, id=self.id, knockout=True, rng=self._rng)
 		else:
 			if not self._match.knockout:
 				raise Exception("A match that can be drawn was loaded into knockout phase. This is not acceptable.")
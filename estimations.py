@@ -21,24 +21,55 @@
 
 # Coded by Saveliy Vasiliev for project 301060 (https://301060.exactas.uba.ar/)
 
+import os
 import random
 import pprint
-import estimations_data as data
+import numpy as np
+import fixture_data as fd
+import config
 
 result_order = [[5,0],[5,1],[5,2],[5,3],[5,4],[4,0],[4,1],[4,2],[4,3],[3,0],[3,1],[3,2],[2,0],[2,1],[1,0],[0,0],[1,1],[2,2],[3,3],[4,4],[5,5],[0,1],[1,2],[0,2],[2,3],[1,3],[0,3],[3,4],[2,4],[1,4],[0,4],[4,5],[3,5],[2,5],[1,5],[0,5]]
 
 
-def random_score(team1, team2):
-	r = random.uniform(0,1) 
+def random_score(team1, team2, rng=random):
+	"""
+	Returns a random score {team1: goals1, team2: goals2}, drawn with the sampler set in config.sampler.
+	team1 and team2 are either team codes or team ids (see fd.team_ids).
+	rng: a random.Random, defaults to the random module.
+	"""
+	id1 = fd.team_ids[team1] if isinstance(team1, str) else team1
+	id2 = fd.team_ids[team2] if isinstance(team2, str) else team2
+	goals = random_goals(id1, id2, rng)
+	return {team1: goals[0], team2: goals[1]}
 
-	if team1 in data.accumulated and team2 in data.accumulated[team1]:
-		accumulated = data.accumulated[team1][team2]
-		result_index = next(i for i, v in enumerate(accumulated) if v >= r)
-		return dict(zip([team1, team2], result_order[result_index][:]))
-	else:
-		accumulated = data.accumulated[team2][team1]
-		result_index = next(i for i, v in enumerate(accumulated) if v >= r)
-		return dict(zip([team1, team2], result_order[result_index][::-1]))
+
+def random_goals(team1, team2, rng=random):
+	"""
+	Same as random_score for team ids, returns the pair (goals1, goals2).
+	"""
+	if config.sampler == "alias":
+		return alias_table().draw(team1, team2, rng.random(), rng.random())
+	return _scan_goals(team1, team2, rng)
+
+
+def _scan_goals(team1, team2, rng=random):
+	# Linear search over the accumulated probabilities of team1 vs team2 (team ids).
+	accumulated, results = _accumulated_rows()[team1][team2]
+	r = rng.uniform(0,1) 
+	return results[next(i for i, v in enumerate(accumulated) if v >= r)]
+
+
+_accumulated_by_id = None
+
+def _accumulated_rows():
+	"""
+	The accumulated probabilities as a list of lists indexed by team ids, holding
+	(accumulated, results) where results is result_order.
+	"""
+	global _accumulated_by_id
+	if _accumulated_by_id is None:
+		_accumulated_by_id = [[(row, result_order) for row in rows] for rows in score_table().cum.tolist()]
+	return _accumulated_by_id
 
 
 def result_matrix(team1, team2):
@@ -49,24 +80,239 @@ def result_matrix(team1, team2):
 	return d
 
 def _get_prob_row_and_order(team1, team2):
+	return table().row(team1, team2).tolist(), result_order[:]
+
+
+class EstimationTable(object):
+	"""
+	The probabilities of the results of every match, as a dense array: probs[i, j, r]
+	is the probability of team i scoring result_order[r][0] goals and team j
+	result_order[r][1], i and j being indices in teams (so [j, i] holds the row of
+	[i, j] with the results reversed). Rows don't need to add up to exactly 1.
+	It is saved as path.npy, with the team codes in path.teams (one per line), and
+	loaded by memory-mapping the array, so it takes no parsing and processes share it.
+	"""
+	def __init__(self, teams, probs):
+		self.teams = teams
+		self.probs = probs
+		self.team_ids = dict((team, k) for k, team in enumerate(teams))
+
+	def row(self, team1, team2):
+		# probabilities of the results of team1 vs team2 (codes), as seen by team1
+		return self.probs[self.team_ids[team1], self.team_ids[team2]]
+
+	def pairs(self):
+		# (team1, team2) indices of every pair with probabilities, once each
+		return [(i, j) for i, j in zip(*np.nonzero(self.probs.any(axis=2))) if i < j]
+
+	def save(self, path):
+		np.save(path + ".npy", np.asarray(self.probs, dtype=np.float64))
+		with open(path + ".teams", "w") as f:
+			f.write("\n".join(self.teams) + "\n")
+
+
+def load_table(path):
+	"""
+	Loads the EstimationTable saved at path (without extension), indexed by fd.team_ids.
+	"""
+	with open(path + ".teams") as f:
+		teams = f.read().split()
+	probs = np.load(path + ".npy", mmap_mode="r")
+	if probs.shape != (len(teams), len(teams), len(result_order)):
+		raise ValueError("{}.npy doesn't match its {} teams.".format(path, len(teams)))
+	if teams != fd.teams:
+		missing = set(fd.teams) - set(teams)
+		if missing:
+			raise ValueError("{} has no probabilities for {}.".format(path, ", ".join(sorted(missing))))
+		order = [teams.index(team) for team in fd.teams]
+		probs = probs[np.ix_(order, order)]
+	return EstimationTable(fd.teams, probs)
+
+
+def table_from_data():
+	"""
+	Builds the EstimationTable from estimations_data.py, which is much slower than loading it.
+	"""
+	import estimations_data as data
+	n = len(fd.teams)
+	reverse = [result_order.index(r[::-1]) for r in result_order]
+	probs = np.zeros((n, n, len(result_order)))
 	for row in data.prob_ivan:
-		if team1 == row[0] and team2 == row[1]:
-			return row[2:], result_order[:]
-		elif team1 == row[1] and team2 == row[0]:
-			return row[2:], [l[::-1] for l in result_order]
+		i, j = fd.team_ids[row[0]], fd.team_ids[row[1]]
+		probs[i, j] = row[2:]
+		probs[j, i] = probs[i, j, reverse]
+	return EstimationTable(fd.teams, probs)
+
+
+class ScoreTable(object):
+	"""
+	Compiled version of the EstimationTable for sampling many scores at once.
+	cum, goals1 and goals2 are indexed by [team1_id, team2_id, result] (ids as in
+	fd.team_ids): probs holds the (normalized) probabilities of the results in
+	result_order, cum their accumulated values and goals1/goals2 the goals of
+	team1/team2 in each result.
+	wins[team1_id, team2_id] is the probability of team1 beating team2 in a knockout
+	match: winning in regular time or, with half the probability of a draw, on penalties.
+	"""
+	def __init__(self):
+		n = len(fd.teams)
+		raw = table().probs
+		total = raw.sum(axis=2, keepdims=True)
+		total[total == 0] = 1
+		self.cum = np.cumsum(raw, axis=2) / total
+		# rounding can leave the last value below 1, where uniforms would fall off the row
+		self.cum[..., -1] = 1.0
+		self.probs = raw / total
+		shape = (n, n, len(result_order))
+		self.goals1 = np.broadcast_to(np.array([r[0] for r in result_order], dtype=np.int8), shape).copy()
+		self.goals2 = np.broadcast_to(np.array([r[1] for r in result_order], dtype=np.int8), shape).copy()
+		# penalties are a coin flip, as in Match._define_winner_and_loser
+		self.wins = (self.probs * (self.goals1 > self.goals2)).sum(axis=2) + (self.probs * (self.goals1 == self.goals2)).sum(axis=2) / 2
+		# Shifting every row by 2 * (its flat pair index) keeps the whole table sorted,
+		# so the results of different pairs can be searched in a single call.
+		self._shifted = (self.cum + 2 * np.arange(n * n).reshape(n, n, 1)).ravel()
+		self._flat_goals1 = self.goals1.ravel()
+		self._flat_goals2 = self.goals2.ravel()
+
+	def sample(self, team1, team2, u):
+		"""
+		Returns the arrays (goals1, goals2) of the scores of team1 vs team2 drawn by
+		inverse CDF from the uniforms u. team1 and team2 are team ids, either arrays
+		broadcastable to u or single ids (then only their own row is searched).
+		"""
+		pair = np.asarray(team1) * len(fd.teams) + np.asarray(team2)
+		if pair.ndim == 0:
+			offset = pair * len(result_order)
+			r = offset + np.searchsorted(self._shifted[offset:offset + len(result_order)], u + 2 * pair)
+		else:
+			r = np.searchsorted(self._shifted, u + 2 * pair)
+		return self._flat_goals1[r], self._flat_goals2[r]
+
+
+class AliasTable(ScoreTable):
+	"""
+	ScoreTable that samples with Walker/Vose alias tables instead of searching the
+	accumulated probabilities, so that every draw takes constant time.
+	prob and alias are indexed by [team1_id, team2_id, result] like cum.
+	"""
+	def __init__(self):
+		super().__init__()
+		n = len(fd.teams)
+		self.prob = np.ones((n, n, len(result_order)))
+		self.alias = np.tile(np.arange(len(result_order), dtype=np.int8), (n, n, 1))
+		self._rows = {}
+		for i, j in zip(*np.nonzero(self.probs.any(axis=2))):
+			prob, alias = _alias_row(self.probs[i, j].tolist())
+			self.prob[i, j] = prob
+			self.alias[i, j] = alias
+			self._rows[(i, j)] = (prob, alias, result_order)
+		self._flat_prob = self.prob.ravel()
+		self._flat_alias = self.alias.ravel()
+
+	def draw(self, team1, team2, u1, u2):
+		"""
+		Scalar form: returns [goals1, goals2] of team1 vs team2 (team ids) for the uniforms u1, u2.
+		"""
+		prob, alias, results = self._rows[(team1, team2)]
+		k = int(u1 * len(prob))
+		return results[k if u2 < prob[k] else alias[k]]
+
+	def sample(self, team1, team2, u):
+		"""
+		Same as ScoreTable.sample. Each uniform is split in two: its integer part
+		scaled by the number of results picks the column and the fractional part is
+		the acceptance test, which is equivalent to drawing two independent uniforms.
+		"""
+		pair = np.asarray(team1) * len(fd.teams) + np.asarray(team2)
+		scaled = u * len(result_order)
+		column = scaled.astype(np.int64)
+		r = pair * len(result_order) + column
+		accept = (scaled - column) < self._flat_prob[r]
+		r = np.where(accept, r, r - column + self._flat_alias[r])
+		return self._flat_goals1[r], self._flat_goals2[r]
+
+
+def _alias_row(p):
+	"""
+	Vose's alias method: returns (prob, alias) lists for the (unnormalized) probabilities p.
+	"""
+	total = sum(p)
+	scaled = [x * len(p) / total for x in p]
+	prob = [1.0] * len(p)
+	alias = list(range(len(p)))
+	small = [i for i, x in enumerate(scaled) if x < 1]
+	large = [i for i, x in enumerate(scaled) if x >= 1]
+	while small and large:
+		s = small.pop()
+		l = large.pop()
+		prob[s] = scaled[s]
+		alias[s] = l
+		scaled[l] += scaled[s] - 1
+		if scaled[l] < 1:
+			small.append(l)
+		else:
+			large.append(l)
+	return prob, alias
+
+
+_table = None
+_score_table = None
+_alias_table = None
+
+def table():
+	"""
+	The EstimationTable, loaded from config.estimations_file on first use (or built
+	from estimations_data.py when it hasn't been converted).
+	"""
+	global _table
+	if _table is None:
+		path = table_path()
+		_table = load_table(path) if os.path.exists(path + ".npy") else table_from_data()
+	return _table
+
+def table_path():
+	# config.estimations_file, relative to this directory
+	return os.path.join(os.path.dirname(os.path.abspath(__file__)), config.estimations_file)
+
+def score_table():
+	"""
+	The ScoreTable, built on first use.
+	"""
+	global _score_table
+	if _score_table is None:
+		_score_table = ScoreTable()
+	return _score_table
+
+def alias_table():
+	"""
+	The AliasTable, built on first use.
+	"""
+	global _alias_table
+	if _alias_table is None:
+		_alias_table = AliasTable()
+	return _alias_table
 
+def winning_probs():
+	"""
+	Matrix of P(team1 beats team2 in a knockout match), indexed by team ids. See ScoreTable.
+	"""
+	return score_table().wins
 
-def _build_accumulated_probs():
-	acc = {}
-	for p in data.prob_ivan:
-		if p[0] not in acc:
-			acc[p[0]] = {} 
-		raw_accum = [sum(p[2:i+3]) for i in range(len(p)-2)] # norm
-		acc[p[0]][p[1]] = [a/raw_accum[-1] for a in raw_accum]
-	return acc
+def batch_sampler():
+	"""
+	The table used for drawing arrays of scores, as set in config.sampler.
+	"""
+	if config.sampler == "alias":
+		return alias_table()
+	return score_table()
 
 
 if __name__ == "__main__":
+	import sys
+	if sys.argv[1:2] == ["convert"]:
+		# python3 estimations.py convert [path]: rewrites the EstimationTable from estimations_data.py
+		table_from_data().save(sys.argv[2] if len(sys.argv) > 2 else table_path())
+		sys.exit()
 	for i in range(100):
 		print(random_score("ARG", "KSA"))
 		print(random_score("KSA", "ARG"))
@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2018 by Instituto de Cálculo, http://www.ic.fcen.uba.ar/
+
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+# Coded by Saveliy Vasiliev for project 301060 (https://301060.exactas.uba.ar/)
+
+import itertools
+import numpy as np
+import estimations as est
+import fixture_data as fd
+import group
+import match
+import pprint
+
+
+class ExactGroupStage(object):
+	"""
+	Probabilities of the final positions of every group, computed exactly by
+	enumerating all the results of the matches left in the group when there are at
+	most max_outcomes of them (36 results per match: 36 with one match left, 1296
+	with two, ...). Otherwise the remaining matches are sampled, like Simulator does.
+	Ties that survive the Group criteria are split evenly, as the random tie
+	breaker of Group does on average.
+	"""
+	def __init__(self, group_matches, max_outcomes=36 ** 3, samples=1000000, seed=None, groups=None,
+			rankings_only=False):
+		"""
+		group_matches: the matches already played (of any group).
+		samples: number of samples for the groups that are not enumerated. With 0
+			those groups are left out of probs_group_position.
+		seed: seed of the sampling.
+		groups: names of the groups to solve, all of them by default.
+		rankings_only: only compute probs_ranking. Sampled groups are then ranked like
+			BatchSimulator does, breaking the ties with a uniform.
+		"""
+		self._group_matches = group_matches
+		self._max_outcomes = max_outcomes
+		self._samples = samples
+		self._rankings_only = rankings_only
+		self._rng = np.random.default_rng(seed)
+		self._table = est.score_table()
+		self._probs = {}
+		self._first_second = {}
+		self._rankings = {}
+		self._exact = {}
+		for gname in (fd.groups if groups is None else groups):
+			self._solve(gname)
+
+
+	def _known_match(self, fixture_match):
+		return next((km for km in self._group_matches if {km.team1, km.team2} == fixture_match), None)
+
+
+	def _solve(self, gname):
+		teams = fd.groups[gname]
+		slot = dict((team, k) for k, team in enumerate(teams))
+		points = np.zeros(4, dtype=np.int64)
+		goal_diffs = np.zeros(4, dtype=np.int64)
+		goals = np.zeros(4, dtype=np.int64)
+		pending = []
+		for fixture_match in fd.group_pairs[gname]:
+			team1, team2 = sorted(fixture_match)
+			known_match = self._known_match(fixture_match)
+			if known_match is None:
+				pending.append((team1, team2))
+				continue
+			score = known_match.score()
+			_add_result(points, goal_diffs, goals, slot[team1], slot[team2], score[team1], score[team2])
+
+		n_results = len(est.result_order)
+		if n_results ** len(pending) <= self._max_outcomes:
+			# Every row is a combination of results of the pending matches.
+			results = np.indices((n_results,) * len(pending)).reshape(len(pending), n_results ** len(pending)).T
+			weights = np.ones(len(results))
+			for m, (team1, team2) in enumerate(pending):
+				weights *= self._table.probs[fd.team_ids[team1], fd.team_ids[team2], results[:, m]]
+			self._exact[gname] = True
+		elif self._samples == 0:
+			self._exact[gname] = False
+			return
+		elif self._rankings_only:
+			self._exact[gname] = False
+			self._rankings[gname] = self._sample_rankings(teams, slot, group.sort_key(points, goal_diffs, goals), pending)
+			return
+		else:
+			results = np.empty((self._samples, len(pending)), dtype=np.int64)
+			for m, (team1, team2) in enumerate(pending):
+				cum = self._table.cum[fd.team_ids[team1], fd.team_ids[team2]]
+				results[:, m] = np.searchsorted(cum, self._rng.random(self._samples))
+			weights = np.full(self._samples, 1 / self._samples)
+			self._exact[gname] = False
+
+		points = np.tile(points, (len(results), 1))
+		goal_diffs = np.tile(goal_diffs, (len(results), 1))
+		goals = np.tile(goals, (len(results), 1))
+		for m, (team1, team2) in enumerate(pending):
+			i, j = fd.team_ids[team1], fd.team_ids[team2]
+			_add_result(points, goal_diffs, goals, slot[team1], slot[team2],
+				self._table.goals1[i, j, results[:, m]].astype(np.int64), self._table.goals2[i, j, results[:, m]].astype(np.int64))
+
+		key = group.sort_key(points, goal_diffs, goals)
+		# better[:, i]: teams ranked above team i; tied[:, i]: teams tied with i (including it).
+		better = (key[:, None, :] > key[:, :, None]).sum(axis=2)
+		tied = (key[:, None, :] == key[:, :, None]).sum(axis=2)
+		if not self._rankings_only:
+			self._position_probs(gname, teams, weights, key, better, tied)
+
+		# Every ranking that orders the keys is equally likely.
+		self._rankings[gname] = {}
+		consistent = [np.all([key[:, perm[i]] >= key[:, perm[i + 1]] for i in range(3)], axis=0)
+			for perm in _rankings]
+		count = np.sum(consistent, axis=0)
+		for perm, c in zip(_rankings, consistent):
+			p = float((weights * c / count).sum())
+			if p > 0:
+				self._rankings[gname][tuple(teams[k] for k in perm)] = p
+
+
+	def _position_probs(self, gname, teams, weights, key, better, tied):
+		# probs_group_position and probs_first_second of gname from the weighted keys
+		self._probs[gname] = {}
+		for k, team in enumerate(teams):
+			self._probs[gname][team] = {}
+			for pos in range(4):
+				inside = (better[:, k] <= pos) & (pos < better[:, k] + tied[:, k])
+				self._probs[gname][team][str(pos + 1)] = float((weights * inside / tied[:, k]).sum())
+
+		self._first_second[gname] = {}
+		first = (better == 0) / tied
+		second = ((better <= 1) & (1 < better + tied)) / tied
+		for k1, team1 in enumerate(teams):
+			for k2, team2 in enumerate(teams):
+				if k1 == k2:
+					continue
+				# Teams in the same block of ties at the top take both places in any order,
+				# otherwise the places are taken independently.
+				same = key[:, k1] == key[:, k2]
+				top_pair = ((better[:, k1] == 0) & (tied[:, k1] >= 2)) / np.maximum(tied[:, k1] * (tied[:, k1] - 1), 1)
+				p = float((weights * np.where(same, top_pair, first[:, k1] * second[:, k2])).sum())
+				if p > 0:
+					self._first_second[gname][(team1, team2)] = p
+
+
+	def _sample_rankings(self, teams, slot, known_key, pending):
+		"""
+		Distribution of the rankings of self._samples draws of the pending matches. The
+		key of group.sort_key adds up over the matches, so each draw only looks up what
+		its result adds to the keys of both teams; a uniform breaks the ties.
+		"""
+		key = np.tile(known_key.astype(np.float64), (self._samples, 1))
+		for team1, team2 in pending:
+			i, j = fd.team_ids[team1], fd.team_ids[team2]
+			results = np.searchsorted(self._table.cum[i, j], self._rng.random(self._samples))
+			goals1, goals2 = self._table.goals1[i, j].astype(np.int64), self._table.goals2[i, j].astype(np.int64)
+			key[:, slot[team1]] += _key_change(goals1, goals2)[results]
+			key[:, slot[team2]] += _key_change(goals2, goals1)[results]
+		key += self._rng.random(key.shape)
+		order = np.argsort(-key, axis=1)
+		counts = np.bincount(order @ _ranking_digits, minlength=4 ** 4)
+		rankings = {}
+		for perm in _rankings:
+			if counts[perm @ _ranking_digits] > 0:
+				rankings[tuple(teams[k] for k in perm)] = float(counts[perm @ _ranking_digits] / self._samples)
+		return rankings
+
+
+	def is_exact(self, group_name):
+		"""
+		Whether the probabilities of group_name were enumerated (True) or sampled (False).
+		"""
+		return self._exact[group_name]
+
+	def probs_group_position(self):
+		# group x team x position, as Simulator.probs_group_position
+		return self._probs
+
+	def probs_first_second(self):
+		# group x (first, second): probability of that pair of teams qualifying in that order
+		return self._first_second
+
+	def probs_ranking(self):
+		# group x (first, second, third, fourth): probability of each final ranking
+		return self._rankings
+
+
+# orders of the 4 teams of a group, as positions in fd.groups
+_rankings = [np.array(perm) for perm in itertools.permutations(range(4))]
+# digits that turn an order into a base 4 code
+_ranking_digits = 4 ** np.arange(3, -1, -1)
+
+
+def _key_change(goals1, goals2):
+	# What a goals1-goals2 result adds to the group.sort_key of the team that scored goals1.
+	points = 3 * (goals1 > goals2) + (goals1 == goals2)
+	return group.sort_key(points, goals1 - goals2, goals1) - group.sort_key(0, 0, 0)
+
+
+def _add_result(points, goal_diffs, goals, slot1, slot2, goals1, goals2):
+	# Adds the result goals1-goals2 between the teams in slot1 and slot2 (the last axis) to the totals.
+	points[..., slot1] += 3 * (goals1 > goals2) + (goals1 == goals2)
+	points[..., slot2] += 3 * (goals2 > goals1) + (goals1 == goals2)
+	goal_diffs[..., slot1] += goals1 - goals2
+	goal_diffs[..., slot2] += goals2 - goals1
+	goals[..., slot1] += goals1
+	goals[..., slot2] += goals2
+
+
+if __name__ == '__main__':
+	import time
+	start = time.time()
+	egs = ExactGroupStage([
+		match.Match("RUS", "KSA", 5, 0), match.Match("EGY", "URU", 0, 1),
+		match.Match("RUS", "EGY", 3, 1), match.Match("URU", "KSA", 1, 0),
+		match.Match("ESP", "POR", 3, 3), match.Match("MAR", "IRN", 0, 1),
+		match.Match("MAR", "POR", 0, 1), match.Match("IRN", "ESP", 0, 1)], samples=100000)
+	print("Computed in {:.3f}s".format(time.time() - start))
+	for gname in ["A", "B", "C"]:
+		print("Group {} ({})".format(gname, "exact" if egs.is_exact(gname) else "sampled"))
+		pprint.pprint(egs.probs_group_position()[gname])
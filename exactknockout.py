@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2018 by Instituto de Cálculo, http://www.ic.fcen.uba.ar/
+
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+# Coded by Saveliy Vasiliev for project 301060 (https://301060.exactas.uba.ar/)
+
+import numpy as np
+import estimations as est
+import fixture_data as fd
+import exactgroup as eg
+import bracket
+import match
+import pprint
+
+
+class ExactKnockout(object):
+	"""
+	Exact probabilities of the knockout stage, propagated analytically up the bracket
+	instead of simulated. It needs the joint distribution of (first, second) of every
+	group, so it works when all the groups can be enumerated by ExactGroupStage (in
+	particular when the group stage is over). Knockout matches are won with the
+	probabilities of est.winning_probs(), draws being settled 50/50 like Match does.
+
+	Given the group results the matches are independent, so the only correlation
+	comes from the groups: A1 and A2 play S1 and S3, which in turn play Q1 and Q3, ...
+	The bracket is therefore propagated in mirrored pairs of nodes (S1 and S3, Q1 and
+	Q3, ..., SF1 and SF2) keeping the joint distribution of both of their winners,
+	while the two nodes playing each other always come from different groups.
+	The output has the same shape as that of Simulator.
+	"""
+	def __init__(self, group_matches, knockout_matches={}, max_outcomes=36 ** 3, group_stage=None):
+		"""
+		group_matches: the matches already played (of any group).
+		knockout_matches: a dictionary {slot_label: match} of played knockout matches.
+		max_outcomes: as in ExactGroupStage. ValueError is raised if a group has more.
+		group_stage: the distributions of the groups, with the probs_first_second and
+			probs_group_position methods of ExactGroupStage (e.g. a groupcache.GroupBlocks).
+			When given, group_matches and max_outcomes are not used.
+		"""
+		if group_stage is None:
+			group_stage = eg.ExactGroupStage(group_matches, max_outcomes=max_outcomes, samples=0)
+			if not all(group_stage.is_exact(gname) for gname in fd.groups):
+				raise ValueError("There are too many group matches left to compute the knockout stage exactly.")
+		self._groups = group_stage
+		self._wins = est.winning_probs()
+		self._pinned = {}
+		for slot, m in knockout_matches.items():
+			if not m.knockout:
+				raise Exception("A match that can be drawn was loaded into knockout phase. This is not acceptable.")
+			self._pinned[slot] = (fd.team_ids[m.winner()], fd.team_ids[m.loser()])
+		self._propagate()
+
+
+	def _propagate(self):
+		n = len(fd.teams)
+		children = dict((node, (child1, child2)) for node, child1, child2 in bracket.wiring)
+		# joint[(label1, label2)][a, b]: P(team a is in label1 and team b in label2)
+		joint = {}
+		mirror = {}
+		for gname, first_second in self._groups.probs_first_second().items():
+			p = np.zeros((n, n))
+			for (first, second), prob in first_second.items():
+				p[fd.team_ids[first], fd.team_ids[second]] = prob
+			joint[(gname + "1", gname + "2")] = p
+			mirror[gname + "1"], mirror[gname + "2"] = gname + "2", gname + "1"
+
+		def get_joint(label1, label2):
+			return joint[(label1, label2)] if (label1, label2) in joint else joint[(label2, label1)].T
+
+		self._pairs = {}
+		for node, child1, child2 in bracket.wiring:
+			if node in mirror:
+				continue
+			if node == "Final":
+				final = get_joint(child1, child2)
+				self._pairs[node] = final + final.T
+				self._check_pinned(node, self._pairs[node])
+				self._final = final
+				continue
+			# the node whose children are mirrors of node's children
+			other = next(o for o, o1, o2 in bracket.wiring if {o1, o2} == {mirror[child1], mirror[child2]})
+			mirror[node], mirror[other] = other, node
+			left, right = get_joint(child1, mirror[child1]), get_joint(child2, mirror[child2])
+			for label, team1, team2 in [(node, left.sum(axis=1), right.sum(axis=1)), (other, left.sum(axis=0), right.sum(axis=0))]:
+				self._pairs[label] = np.outer(team1, team2) + np.outer(team2, team1)
+				self._check_pinned(label, self._pairs[label])
+			wins1, wins2 = self._node_wins(node), self._node_wins(other)
+			joint[(node, other)] = _joint_play(left, right, wins1, wins2)
+			if node == "SF1":
+				losers = _joint_play(left, right, wins1.T, wins2.T)
+				self._pairs["ThirdPlace"] = losers + losers.T
+				self._check_pinned("ThirdPlace", self._pairs["ThirdPlace"])
+
+
+	def _node_wins(self, node):
+		# est.winning_probs() with the result of the match played at node, if known
+		if node not in self._pinned:
+			return self._wins
+		winner, loser = self._pinned[node]
+		wins = self._wins.copy()
+		wins[winner, loser], wins[loser, winner] = 1, 0
+		return wins
+
+
+	def _check_pinned(self, node, pairs):
+		if node not in self._pinned:
+			return
+		winner, loser = self._pinned[node]
+		if not np.isclose(pairs[winner, loser], 1):
+			raise Exception("Known match {} vs {} at {} has probability {} of being played.".format(
+				fd.teams[winner], fd.teams[loser], node, pairs[winner, loser]))
+
+
+	def seed(self):
+		# exact results don't depend on a seed
+		return None
+
+	def iterations(self):
+		# nothing is iterated here, the groups may have been sampled though
+		return None
+
+	def precision(self):
+		return None
+
+	def probs_reaching_node(self):
+		# node x team; only the teams that can reach the node are listed
+		probs = {}
+		for node, _, _ in bracket.wiring:
+			reached = self._pairs[node].sum(axis=1).tolist()
+			probs[node] = {fd.teams[team]: p for team, p in enumerate(reached) if p > 0}
+		return probs
+
+	def probs_pair_playing_at_node(self):
+		# node x team1 x team2: P(team1 faces team2 given that team1 reached node1)
+		probs = {}
+		for node, _, _ in bracket.wiring:
+			pairs = self._pairs[node]
+			reached = pairs.sum(axis=1)
+			probs[node] = {}
+			for team1, rivals in enumerate(pairs.tolist()):
+				if reached[team1] > 0:
+					probs[node][fd.teams[team1]] = {fd.teams[team2]: p / reached[team1] for team2, p in enumerate(rivals) if p > 0}
+		return probs
+
+	def probs_group_position(self):
+		return self._groups.probs_group_position()
+
+	def probs_champion(self):
+		champion = (self._pairs["Final"] * self._node_wins("Final")).sum(axis=1)
+		return dict(zip(fd.teams, champion.tolist()))
+
+	def probs_second(self):
+		second = (self._pairs["Final"] * self._node_wins("Final").T).sum(axis=1)
+		return dict(zip(fd.teams, second.tolist()))
+
+	def probs_third(self):
+		third = (self._pairs["ThirdPlace"] * self._node_wins("ThirdPlace")).sum(axis=1)
+		return dict(zip(fd.teams, third.tolist()))
+
+
+def _joint_play(left, right, wins1, wins2):
+	"""
+	Joint distribution of the winners of two matches, a vs c (won with wins1) and
+	b vs d (won with wins2), where left[a, b] is the joint distribution of a and b
+	and right[c, d] that of c and d, independent of left.
+	Each term is one combination of sides the winners come from.
+	"""
+	return (left * (wins1 @ right @ wins2.T)
+		+ (left @ wins2.T) * (wins1 @ right)
+		+ (wins1 @ left) * (right @ wins2.T)
+		+ right * (wins1 @ left @ wins2.T))
+
+
+if __name__ == '__main__':
+	import time
+	group_matches = []
+	for gname in sorted(fd.groups):
+		for team1, team2 in sorted(sorted(pair) for pair in fd.group_pairs[gname]):
+			score = est.random_score(team1, team2)
+			group_matches.append(match.Match(team1, team2, score[team1], score[team2]))
+	start = time.time()
+	ek = ExactKnockout(group_matches)
+	print("Computed in {:.3f}s".format(time.time() - start))
+	pprint.pprint(ek.probs_reaching_node()["Final"])
+	pprint.pprint(ek.probs_champion())
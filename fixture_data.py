@@ -122,6 +122,7 @@ groups = {
 }
 
 teams = sorted(_build_teams())
+team_ids = dict((team, i) for i, team in enumerate(teams))
 
 
 group_pairs = {
@@ -28,17 +28,28 @@ import pprint
 import random
 import match 
 
+def sort_key(points, goal_diffs, goals):
+	"""
+	Integer (or integer array) ordered as the criteria of Group: points, then goal
+	difference and then goals. Teams with equal keys are tied.
+	"""
+	return (points * 64 + goal_diffs + 32) * 64 + goals
+
+
 class Group(object):
 	"""
     Attributes:
         id: Some way of identifying this group, not required.
         matches: a set of matches within the group
+        rng: random.Random used for breaking ties, defaults to the random module.
     """
-	def __init__(self, matches, id=None):
+	def __init__(self, matches, id=None, rng=random):
 		self.id = id
+		self._rng = rng
 		self._matches = matches
-		self._teams = set([m.team1 for m in self._matches] 
-						+ [m.team2 for m in self._matches])
+		# Sorted so that the tie breaking draws don't depend on the hashing of the set.
+		self._teams = sorted(set([m.team1 for m in self._matches] 
+						+ [m.team2 for m in self._matches]))
 		self._points = self._compute_points()
 		self._goal_diffs = self._compute_goal_diffs()
 		self._goals = self._compute_goals()
@@ -72,6 +83,9 @@ class Group(object):
 			goals[m.team2] += r[m.team2]
 		return goals
 
+	def matches(self):
+		return self._matches
+
 	def result(self):
 		if self._result is None:
 			self._result = sorted(self._teams, key=self._group_sort_key, reverse=True)
@@ -91,7 +105,7 @@ class Group(object):
 
 	def _group_sort_key(self, team):
 		# The random.random is not the most accurate way of sorting teams in case of draw. Can be improved.
-		return (self._points[team], self._goal_diffs[team], self._goals[team], random.random())
+		return (self._points[team], self._goal_diffs[team], self._goals[team], self._rng.random())
 
 	def __str__(self):
 		s = "Group {0}:\n{1:<20} {2:^6} {3:^6} {4:^6}".format(self.id, "Team", "Pts", "Diff", "Goals")
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2018 by Instituto de Cálculo, http://www.ic.fcen.uba.ar/
+
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+# Coded by Saveliy Vasiliev for project 301060 (https://301060.exactas.uba.ar/)
+
+import exactgroup as eg
+import fixture_data as fd
+import match
+import pprint
+
+
+def group_key(group_name, group_matches):
+	"""
+	Key of the known matches of group_name among group_matches, e.g. "A:EGY-URU:0-1,KSA-RUS:0-5".
+	Matches of other groups don't change it, nor does the order or orientation of the matches.
+	Unplayed matches raise ValueError.
+	"""
+	results = []
+	for fixture_match in sorted(sorted(pair) for pair in fd.group_pairs[group_name]):
+		team1, team2 = fixture_match
+		known_match = next((km for km in group_matches if {km.team1, km.team2} == set(fixture_match)), None)
+		if known_match is not None:
+			known_match.digest() # ValueError if it wasn't played, instead of playing it
+			score = known_match.score()
+			results.append("{}-{}:{}-{}".format(team1, team2, score[team1], score[team2]))
+	return "{}:{}".format(group_name, ",".join(results))
+
+
+def solve_group(group_name, group_matches, samples, seed=None):
+	"""
+	Returns the distribution of the final ranking of group_name, as a dictionary
+	{"first,second,third,fourth": probability}, and whether it is exact (else it
+	was sampled with samples draws seeded with seed).
+	"""
+	stage = eg.ExactGroupStage(group_matches, samples=samples, seed=seed, groups=[group_name], rankings_only=True)
+	rankings = dict((",".join(ranking), p) for ranking, p in stage.probs_ranking()[group_name].items())
+	return rankings, stage.is_exact(group_name)
+
+
+class GroupBlocks(object):
+	"""
+	The group stage put together from the ranking distribution of every group, such
+	as those of solve_group. Groups are independent, so each block can be computed
+	(and cached) on its own and only the groups with new results need to be solved
+	again. It can be given as the group_stage of ExactKnockout.
+	"""
+	def __init__(self, rankings):
+		"""
+		rankings: {group_name: {"first,second,third,fourth": probability}}.
+		"""
+		self._positions = {}
+		self._first_second = {}
+		for gname, probs in rankings.items():
+			self._positions[gname] = dict((team, dict((str(pos + 1), 0.0) for pos in range(4))) for team in fd.groups[gname])
+			self._first_second[gname] = {}
+			for ranking, p in probs.items():
+				teams = ranking.split(",")
+				for pos, team in enumerate(teams):
+					self._positions[gname][team][str(pos + 1)] += p
+				pair = (teams[0], teams[1])
+				self._first_second[gname][pair] = self._first_second[gname].get(pair, 0.0) + p
+
+	def probs_group_position(self):
+		# group x team x position, as Simulator.probs_group_position
+		return self._positions
+
+	def probs_first_second(self):
+		# group x (first, second), as ExactGroupStage.probs_first_second
+		return self._first_second
+
+
+if __name__ == '__main__':
+	import time
+	group_matches = [match.Match("RUS", "KSA", 5, 0), match.Match("EGY", "URU", 0, 1)]
+	start = time.time()
+	rankings = {}
+	for gname in sorted(fd.groups):
+		rankings[gname], exact = solve_group(gname, group_matches, 100000, seed=0)
+		print("{} ({})".format(group_key(gname, group_matches), "exact" if exact else "sampled"))
+	print("Solved in {:.3f}s".format(time.time() - start))
+	pprint.pprint(GroupBlocks(rankings).probs_group_position()["A"])
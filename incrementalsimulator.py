@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2018 by Instituto de Cálculo, http://www.ic.fcen.uba.ar/
+
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+# Coded by Saveliy Vasiliev for project 301060 (https://301060.exactas.uba.ar/)
+
+import json
+import numpy as np
+import batchsimulator as bsim
+import bracket
+import fixture_data as fd
+import match
+import config
+import tournamentstate as ts
+
+
+class IncrementalSimulator(bsim.BatchSimulator):
+	"""
+	BatchSimulator that keeps the outcome of every iteration (goals of the group matches,
+	group rankings and knockout winners: 144 bytes) so that new results can be taken
+	into account by condition() instead of simulating again. The iterations can be
+	saved to a file and loaded by the next run.
+
+	Conditioning doesn't need weights: an iteration that sampled another score for a
+	newly known match gets the real one and, if that changes who qualifies, its
+	knockout stage is played again. The same goes for the rounds after a newly known
+	knockout match with a different winner. Only the iterations where that match was
+	played by other teams are impossible and dropped, and when fewer than min_ess of
+	the iterations are left (or the tolerance isn't reached) the simulation is topped
+	up with new ones.
+	"""
+	def __init__(self, group_matches, knockout_matches, iterations, min_ess=0.5, outcomes=None,
+			block_size=100000, verbose=True, seed=None, tolerance=None,
+			tracked=("probs_champion", "probs_group_position"), progress=None):
+		"""
+		min_ess: fraction of iterations that must survive conditioning.
+		outcomes: a file written by save(), with the iterations of a simulation over
+			some of the known matches. They are conditioned on the given ones, unless
+			they were simulated with a result that isn't among them (or with another
+			config.knockout_mode or estimation tables), in which case the simulation
+			starts from scratch.
+		"""
+		self._min_ess = min_ess
+		self._outcomes_file = outcomes
+		super().__init__(group_matches, knockout_matches, iterations, block_size=block_size, verbose=verbose, seed=seed,
+			tolerance=tolerance, tracked=tracked, progress=progress)
+
+
+	def _run(self):
+		self._np_rng = np.random.default_rng(self._seed_sequence)
+		self._target = self._iterations
+		self._init_knockout_wins()
+		self._init_group_stage()
+		self._goals = np.empty((2 * len(self._match_team1), 0), dtype=np.int8)
+		self._rankings = np.empty((0, len(bsim.group_names), 4), dtype=np.int8)
+		self._knockout = np.empty((len(bracket.wiring) + 1, 0), dtype=np.int8)
+		self._conditioned = _known_results([], {})
+		if self._outcomes_file is not None:
+			with np.load(self._outcomes_file) as outcomes:
+				saved = json.loads(str(outcomes["known"])) if "known" in outcomes else None
+				if saved is not None and _follows(saved, _known_results(self._group_matches, self._knockout_matches)):
+					self._goals, self._rankings, self._knockout = outcomes["goals"], outcomes["rankings"], outcomes["knockout"]
+					self._conditioned = saved
+		if len(self._rankings):
+			self.condition(self._group_matches, self._knockout_matches)
+		else:
+			self._conditioned = _known_results(self._group_matches, self._knockout_matches)
+			self._fill()
+
+
+	def _fill(self):
+		# Tops up the stored iterations to the target, a block at a time so that it stops
+		# once the tolerance is reached.
+		self._recount()
+		while self._iterations < self._target and not self._precise_enough(self._iterations):
+			start = self._iterations
+			self._top_up(min(self._block_size, self._target - start))
+			self._count_block(self._rankings[start:].astype(np.int64), self._knockout[:, start:].astype(np.int64))
+			self._iterations = len(self._rankings)
+		if self._iterations < self._target:
+			# stopped by the tolerance
+			self._update_progress(self._iterations)
+
+
+	def _top_up(self, n):
+		# Plays n new iterations with the current known matches. Those that don't reach
+		# the known knockout matches are dropped, like in condition().
+		rng = self._np_rng
+		goals, rankings, knockout = [self._goals], [self._rankings], [self._knockout]
+		done = 0
+		while done < n:
+			block_goals = self._group_goals(self._block_size, rng)
+			block_rankings = self._group_rankings(block_goals, rng)
+			block_knockout, valid = self._play_knockout(block_rankings, rng, strict=False)
+			if not valid.any():
+				raise Exception("The simulation can't reach the loaded knockout matches. Check for previous matches.")
+			valid = np.flatnonzero(valid)[:n - done]
+			goals.append(block_goals[:, valid])
+			rankings.append(block_rankings[valid].astype(np.int8))
+			knockout.append(block_knockout[:, valid].astype(np.int8))
+			done += len(valid)
+			# the counters are only updated afterwards, so there is no precision yet
+			self._progress.update(self._goals.shape[1] + done, self._target)
+		self._goals = np.concatenate(goals, axis=1)
+		self._rankings = np.concatenate(rankings)
+		self._knockout = np.concatenate(knockout, axis=1)
+
+
+	def _recount(self):
+		# counters from scratch over the stored iterations
+		for counter in self._counters():
+			counter[...] = 0
+		self._iterations = len(self._rankings)
+		for start in range(0, self._iterations, self._block_size):
+			end = start + self._block_size
+			self._count_block(self._rankings[start:end].astype(np.int64), self._knockout[:, start:end].astype(np.int64))
+
+
+	def condition(self, group_matches, knockout_matches):
+		"""
+		Updates the probabilities to the known matches group_matches and knockout_matches,
+		which must include those of this simulation. Returns the number of stored
+		iterations that were kept (before topping up).
+		"""
+		known = _known_results(group_matches, knockout_matches)
+		if not _follows(self._conditioned, known):
+			raise ValueError("The known matches must include those the simulation was conditioned on.")
+		self._conditioned = known
+		self._group_matches = group_matches
+		self._known_group_pairs = []
+		self._build_known_group_pairs()
+		self._knockout_matches = knockout_matches
+		self._init_knockout_wins()
+		self._init_group_stage()
+		rng = self._np_rng
+		n_matches = len(self._match_team1)
+		keep = np.ones(len(self._rankings), dtype=bool)
+		replay = np.zeros(len(self._rankings), dtype=bool)
+
+		for m, (goals1, goals2) in self._known.items():
+			changed = np.flatnonzero((self._goals[m] != goals1) | (self._goals[n_matches + m] != goals2))
+			if len(changed) == 0:
+				continue
+			self._goals[m, changed], self._goals[n_matches + m, changed] = goals1, goals2
+			g = self._match_group[m]
+			rankings = self._group_rankings(self._goals[:, changed], rng, slice(g, g + 1))[:, 0]
+			replay[changed] |= np.any(rankings[:, :2] != self._rankings[changed, g, :2], axis=1)
+			self._rankings[changed, g] = rankings
+
+		replayed = np.flatnonzero(replay)
+		if len(replayed):
+			knockout, valid = self._play_knockout(self._rankings[replayed].astype(np.int64), rng, strict=False)
+			self._knockout[:, replayed] = knockout
+			keep[replayed] = valid
+
+		labels = [node for node, _, _ in bracket.wiring] + ["ThirdPlace"]
+		for k, label in enumerate(labels):
+			if label not in knockout_matches:
+				continue
+			known_match = knockout_matches[label]
+			teams = {fd.team_ids[known_match.team1], fd.team_ids[known_match.team2]}
+			winners = self._winners()
+			team1, team2 = (winners[label + "_1"], winners[label + "_2"])
+			played = ~replay & np.isin(team1, list(teams)) & np.isin(team2, list(teams)) & (team1 != team2)
+			keep &= played | replay
+			again = np.flatnonzero(played & (self._knockout[k] != fd.team_ids[known_match.winner()]))
+			if len(again):
+				knockout, valid = self._play_knockout(self._rankings[again].astype(np.int64), rng,
+					knockout=self._knockout[:, again].astype(np.int64), start=k, strict=False)
+				self._knockout[:, again] = knockout
+				keep[again] &= valid
+
+		kept = int(keep.sum())
+		self._goals, self._rankings, self._knockout = self._goals[:, keep], self._rankings[keep], self._knockout[:, keep]
+		self._recount()
+		if kept < self._min_ess * self._target or (self._tolerance is not None and not self._precise_enough(kept)):
+			self._fill()
+		return kept
+
+
+	def _winners(self):
+		# label -> team ids in it for every stored iteration, plus label_1/label_2 for
+		# the teams playing each node (ThirdPlace included)
+		winners = bsim._leaf_winners(self._rankings)
+		for k, (node, child1, child2) in enumerate(bracket.wiring):
+			winners[node + "_1"], winners[node + "_2"] = winners[child1], winners[child2]
+			winners[node] = self._knockout[k]
+		winners["ThirdPlace_1"], winners["ThirdPlace_2"] = bsim._loser(winners, "SF1"), bsim._loser(winners, "SF2")
+		return winners
+
+
+	def save(self, path):
+		"""
+		Writes the stored iterations to path (a .npz file), to be given as outcomes to a
+		later run, along with the known results they were conditioned on.
+		"""
+		np.savez(path, goals=self._goals, rankings=self._rankings, knockout=self._knockout,
+			known=json.dumps(self._conditioned))
+
+
+def _known_results(group_matches, knockout_matches):
+	# The canonical known results (see tournamentstate), config.knockout_mode and the
+	# estimated probabilities (tournamentstate.tables_digest), which decide the stored iterations.
+	state = ts.TournamentState(group_matches, knockout_matches, None)
+	return {"group": [list(r) for r in state.group_results], "knockout": [list(r) for r in state.knockout_results],
+		"knockout_mode": config.knockout_mode, "tables": state.tables}
+
+
+def _follows(saved, known):
+	# Whether iterations conditioned on the saved results can be conditioned on the known ones.
+	return (saved["knockout_mode"] == known["knockout_mode"]
+		and saved.get("tables") == known["tables"]
+		and all(r in known["group"] for r in saved["group"])
+		and all(r in known["knockout"] for r in saved["knockout"]))
+
+
+if __name__ == '__main__':
+	import time
+	start = time.time()
+	isim = IncrementalSimulator([], {}, config.iterations)
+	print("{} iterations in {:.2f}s".format(config.iterations, time.time() - start))
+	start = time.time()
+	kept = isim.condition([match.Match("RUS", "KSA", 5, 0)], {})
+	print("Conditioned on RUS 5-0 KSA in {:.2f}s, {} iterations kept".format(time.time() - start, kept))
+	pchamp = isim.probs_champion()
+	for team in sorted(pchamp, key=pchamp.get, reverse=True)[:8]:
+		print("Prob_champion({}) = {:.4f}".format(team, pchamp[team]))
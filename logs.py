@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2018 by Instituto de Cálculo, http://www.ic.fcen.uba.ar/
+
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+# Coded by Saveliy Vasiliev for project 301060 (https://301060.exactas.uba.ar/)
+
+import logging
+import os
+import config
+
+
+formatter = logging.Formatter("%(asctime)s:%(levelname)s:%(name)s:%(filename)s(%(lineno)d):%(funcName)s:%(message)s")
+stream_formatter = logging.Formatter("%(levelname)s:%(message)s")
+
+
+class DeferredFileHandler(logging.FileHandler):
+	"""
+	FileHandler that opens its file when the first record is logged, creating its
+	directory if needed, so that importing a module doesn't touch the disk.
+	"""
+	def __init__(self, filename):
+		super().__init__(filename, delay=True)
+
+	def _open(self):
+		os.makedirs(os.path.dirname(self.baseFilename), exist_ok=True)
+		return super()._open()
+
+
+def module_logger(name, filename):
+	"""
+	The logger of a module, writing to filename (at config.file_logging_level) and to
+	the standard error (at config.stream_logging_level).
+	"""
+	logger = logging.getLogger(name)
+	logger.setLevel(logging.DEBUG)
+	if not logger.handlers:
+		file_handler = DeferredFileHandler(filename)
+		file_handler.setFormatter(formatter)
+		file_handler.setLevel(config.file_logging_level)
+
+		stream_handler = logging.StreamHandler()
+		stream_handler.setLevel(config.stream_logging_level)
+		stream_handler.setFormatter(stream_formatter)
+
+		logger.addHandler(file_handler)
+		logger.addHandler(stream_handler)
+	return logger
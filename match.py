@@ -24,10 +24,10 @@
 
 # Coded by Saveliy Vasiliev for project 301060 (https://301060.exactas.uba.ar/)
 
-import estimations as est
 import random
 import pprint
 import hashlib
+import operator
 
 class Match(object):
 	"""
@@ -37,8 +37,10 @@ class Match(object):
         knockout: True if the match cannot be a draw. False otherwise.
         goals: Two integers that represent the result of the game
         	   (This is used to pre-set some result)
+        rng: random.Random used for playing the match, defaults to the random module (which
+        	 is not stored, so that matches can be pickled).
     """
-	def __init__(self, team1, team2, goals1=None, goals2=None, winner=None, knockout=False, id=None):
+	def __init__(self, team1, team2, goals1=None, goals2=None, winner=None, knockout=False, id=None, rng=None):
 		if goals1 is not None and goals2 is None:
 			raise ValueError("If goals1 is set, so must be goals2")
 		if goals2 is not None and goals1 is None:
@@ -54,6 +56,9 @@ class Match(object):
 		self._winner = None
 		self._loser = None
 		self.knockout = knockout
+		self._rng = rng
+		self._digest = None
+		self._hash = None
 		if goals1 is not None:
 			self._score = {team1: goals1, team2: goals2}
 			if goals1 == goals2:
@@ -76,8 +81,9 @@ class Match(object):
 		
 
 	def __str__(self):
-		s = "{0}({1} vs. {2}) [hash={3}]".format(self.id+' ' if self.id is not None else '', self.team1, self.team2, self.__hash__())
+		s = "{0}({1} vs. {2})".format(self.id+' ' if self.id is not None else '', self.team1, self.team2)
 		if self._score is not None:
+			s += " [hash={0}]".format(self.__hash__())
 			if self._score[self.team1] == self._score[self.team2]:
 				s += " DRAW {0}-{1}".format(self._score[self.team1], self._score[self.team2])
 				if self.knockout:
@@ -90,32 +96,37 @@ class Match(object):
 		return s + " PENDING"
 
 
-	def __hash__(self):
-		s_ko = "KO" if self.knockout else "NOKO"
-		if self.knockout:
-			s_ko += str(self.winner())
-		s_team1 = self.team1 + str(self._score[self.team1])
-		s_team2 = self.team2+ str(self._score[self.team2])
-
-		ko_hash = hashlib.md5(s_ko.encode())
-		id_hash = hashlib.md5(self.id.encode()) if self.id else None
-		team1_hash = hashlib.md5(s_team1.encode())
-		team2_hash = hashlib.md5(s_team2.encode())
-
-		ko_hash_int = int(ko_hash.hexdigest(), 16)
-		id_hash_int = int(id_hash.hexdigest(), 16) if id_hash else 0
-		team1_hash_int = int(team1_hash.hexdigest(), 16)
-		team2_hash_int = int(team2_hash.hexdigest(), 16)
+	def digest(self):
+		"""
+		SHA-256 (hex) of the result of the match: its teams with their goals (in the
+		order of the team codes, so it doesn't matter which one is team1), whether it
+		is a knockout match and then its winner, and its id. It is computed once, the
+		result of a match never changes. Only played matches have one.
+		"""
+		if self._digest is None:
+			if self._score is None:
+				raise ValueError("The match {0} vs. {1} has no result, only played matches can be hashed.".format(
+					self.team1, self.team2))
+			teams = sorted([self.team1, self.team2], key=str)
+			self._digest = hashlib.sha256("{0}:{1}|{2}:{3}|{4}|{5}".format(
+				teams[0], self._score[teams[0]], teams[1], self._score[teams[1]],
+				"KO:{0}".format(self._winner) if self.knockout else "NOKO",
+				"" if self.id is None else self.id).encode()).hexdigest()
+		return self._digest
 
-		hash_truncated = (ko_hash_int + team1_hash_int + team2_hash_int + id_hash_int) & 0xffffffffffffffff
-		return hash_truncated
+	def __hash__(self):
+		# the first 64 bits of digest()
+		if self._hash is None:
+			self._hash = int(self.digest()[:16], 16)
+		return self._hash
 
 
 	def _play(self):
 		if self._score is not None:
 			raise RuntimeWarning("The match {0} vs. {1} is already played.".format(self.team1, self.team2))
 		
-		self._score = est.random_score(self.team1, self.team2)
+		import estimations as est # here, as it loads NumPy, which storing and hashing matches don't need
+		self._score = est.random_score(self.team1, self.team2, self._rng or random)
 		self._define_winner_and_loser()
 
 	def _define_winner_and_loser(self):
@@ -127,7 +138,7 @@ class Match(object):
 			self._loser = self.team1
 		if self.knockout and self._score[self.team1] == self._score[self.team2]:
 			# penalties simply add one goal to some team
-			self._winner = random.choice([self.team1, self.team2])
+			self._winner = (self._rng or random).choice([self.team1, self.team2])
 			self._loser = self.team2 if self.team2 != self._winner else self.team1
 
 
@@ -158,6 +169,47 @@ class Match(object):
 		return False
 
 
+class MatchResult(tuple):
+	"""
+	Lightweight, immutable record of a played group match, used inside the simulations
+	instead of Match: a tuple (team1, team2, goals1, goals2) without a __dict__, with
+	the part of the interface of Match that Group needs. Being immutable, the known
+	matches are shared by every iteration instead of copied.
+	"""
+	__slots__ = ()
+	knockout = False
+	id = None
+
+	def __new__(cls, team1, team2, goals1, goals2):
+		return tuple.__new__(cls, (team1, team2, goals1, goals2))
+
+	@classmethod
+	def from_match(cls, m):
+		score = m.score()
+		return cls(m.team1, m.team2, score[m.team1], score[m.team2])
+
+	team1 = property(operator.itemgetter(0))
+	team2 = property(operator.itemgetter(1))
+	goals1 = property(operator.itemgetter(2))
+	goals2 = property(operator.itemgetter(3))
+
+	def score(self):
+		team1, team2, goals1, goals2 = self
+		return {team1: goals1, team2: goals2}
+
+	def winner(self):
+		# None for a draw, as in Match
+		team1, team2, goals1, goals2 = self
+		return team1 if goals1 > goals2 else team2 if goals2 > goals1 else None
+
+	def loser(self):
+		team1, team2, goals1, goals2 = self
+		return team2 if goals1 > goals2 else team1 if goals2 > goals1 else None
+
+	def __repr__(self):
+		return "MatchResult({!r}, {!r}, {!r}, {!r})".format(*self)
+
+
 if __name__ == "__main__":
 	m = Match("RUS", "KSA", knockout=True, goals1=1, goals2=1, winner="RUS", id="TEST_1")
 	print(m)
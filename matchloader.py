@@ -28,31 +28,19 @@ import config
 import match
 import deterministicnode as dnode
 import group
-import estimations as est
 import fixture_data as fd
 import pprint
 import hashlib
-import logging
 import sys
-import simulator as sim
-from pymongo import MongoClient
+import logs
 
-logger = logging.getLogger(__name__)
-logger.setLevel(logging.DEBUG)
+logger = logs.module_logger(__name__, 'log/matchloader.log')
 
-formatter = logging.Formatter("%(asctime)s:%(levelname)s:%(name)s:%(filename)s(%(lineno)d):%(funcName)s:%(message)s")
-stream_formatter = logging.Formatter("%(levelname)s:%(message)s")
 
-file_handler = logging.FileHandler('log/matchloader.log')
-file_handler.setFormatter(formatter)
-file_handler.setLevel(config.file_logging_level)
-
-stream_handler = logging.StreamHandler()
-stream_handler.setLevel(config.stream_logging_level)
-stream_handler.setFormatter(stream_formatter)
-
-logger.addHandler(file_handler)
-logger.addHandler(stream_handler)
+def mongo_client():
+	# pymongo takes longer to import than everything else, so it is imported on first use
+	import pymongo
+	return pymongo.MongoClient('mongodb://localhost:27017/')
 
 
 class MatchLoader(object):
@@ -67,9 +55,9 @@ class MatchLoader(object):
 	def store_group_match(cls, match):
 		try:
 		# Stores match in mongo if there is no another match with the same hash.
-			mdb_client = MongoClient('mongodb://localhost:27017/')
+			mdb_client = mongo_client()
 			collection = mdb_client.worldcup18.group_matches
-			if collection.find_one({"hash": hash(match)}) is None:
+			if collection.find_one(cls._stored_query(match)) is None:
 				collection.insert_one(cls._match_to_dictionary(match))
 				logger.info("Added match [{}] to group matches (MongoDB).".format(str(match)))
 			else:
@@ -82,11 +70,11 @@ class MatchLoader(object):
 	@classmethod
 	def store_knockout_match(cls, match, slot):
 		try:
-			mdb_client = MongoClient('mongodb://localhost:27017/')
+			mdb_client = mongo_client()
 			collection = mdb_client.worldcup18.knockout_matches
 			if not match.knockout:
 				raise Exception("The knockout match must be instantiated with knockout=True.")
-			if collection.find_one({"hash": hash(match), "slot": slot}) is None:
+			if collection.find_one(dict(cls._stored_query(match), slot=slot)) is None:
 				slot_match = cls._match_to_dictionary(match)
 				slot_match["slot"] = slot
 				collection.insert_one(slot_match)
@@ -102,7 +90,7 @@ class MatchLoader(object):
 	@classmethod
 	def load_knockout_matches(cls):
 		try:
-			mdb_client = MongoClient('mongodb://localhost:27017/')
+			mdb_client = mongo_client()
 			db = mdb_client.worldcup18
 			collection = db.knockout_matches
 			qms = collection.find()
@@ -125,7 +113,7 @@ class MatchLoader(object):
 	@classmethod
 	def load_group_matches(cls):
 		try:
-			mdb_client = MongoClient('mongodb://localhost:27017/')
+			mdb_client = mongo_client()
 			db = mdb_client.worldcup18
 			collection = db.group_matches
 			qms = collection.find()
@@ -145,6 +133,22 @@ class MatchLoader(object):
 		 	sys.exit()
 
 
+	@classmethod
+	def _stored_query(cls, match):
+		"""
+		Query for the documents of match: by its hash or, for those stored with the hash of
+		older versions of Match, by its teams and goals (in either order) and the winner
+		of knockout matches. Raises ValueError for unplayed matches, instead of playing them.
+		"""
+		match.digest()
+		score = match.score()
+		stored = [{"team1": team1, "team2": team2, "goals1": score[team1], "goals2": score[team2], "knockout": match.knockout}
+			for team1, team2 in [(match.team1, match.team2), (match.team2, match.team1)]]
+		if match.knockout:
+			for query in stored:
+				query["winner"] = match.winner()
+		return {"$or": [{"hash": hash(match)}] + stored}
+
 	@classmethod
 	def _match_to_dictionary(cls, match):
 		return {
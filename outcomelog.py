@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2018 by Instituto de Cálculo, http://www.ic.fcen.uba.ar/
+
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+# Coded by Saveliy Vasiliev for project 301060 (https://301060.exactas.uba.ar/)
+
+import json
+import os
+import numpy as np
+import bracket
+import fixture_data as fd
+
+
+# column -> shape of each row, all of them int8
+columns = {
+	"rankings": (8, 4),
+	"group_goals": (48, 2),
+	"knockout_goals": (len(bracket.wiring) + 1, 2),
+	"knockout": (len(bracket.wiring) + 1,),
+	}
+# (team1, team2) codes of the group matches, in the order of group_goals: groups sorted
+# by name, their matches as in fd.group_pairs and the teams of each match sorted.
+matches = [sorted(pair) for gname in sorted(fd.groups) for pair in fd.group_pairs[gname]]
+
+
+class OutcomeBlock(object):
+	"""
+	The outcomes of a block of iterations, as given to the batch callbacks of the
+	simulators: an (iterations,) + shape int8 array for each of the columns (see
+	OutcomeWriter) plus losers, with the team id that lost each knockout match. Both
+	engines give the same dtype, the one OutcomeWriter stores.
+	"""
+	def __init__(self, rankings, group_goals, knockout_goals, knockout, losers):
+		self.iterations = len(rankings)
+		self.rankings = np.asarray(rankings, dtype=np.int8)
+		self.group_goals = np.asarray(group_goals, dtype=np.int8)
+		self.knockout_goals = np.asarray(knockout_goals, dtype=np.int8)
+		self.knockout = np.asarray(knockout, dtype=np.int8)
+		self.losers = np.asarray(losers, dtype=np.int8)
+
+
+class OutcomeWriter(object):
+	"""
+	Appends the outcome of every iteration to a directory of fixed width binary
+	columns, one file per column (column.bin, see columns) with a row per iteration,
+	plus meta.json describing them:
+	- rankings: team ids of every group (sorted by name) by final position.
+	- group_goals: goals of the group matches, in the order of matches (also in meta.json).
+	- knockout_goals: goals of the knockout matches (nodes of bracket.wiring and
+	  the third place), -1 when only the winner was drawn.
+	- knockout: team id of the winner of each of those matches.
+	Files are only appended to, in batches, so a log can grow across runs and be
+	read while it is written.
+	"""
+	def __init__(self, path):
+		"""
+		path: the directory, created if needed.
+		"""
+		os.makedirs(path, exist_ok=True)
+		meta = {"columns": dict((name, list(shape)) for name, shape in columns.items()),
+			"matches": matches, "teams": fd.teams, "groups": sorted(fd.groups),
+			"nodes": [node for node, _, _ in bracket.wiring] + ["ThirdPlace"]}
+		meta_path = os.path.join(path, "meta.json")
+		if os.path.exists(meta_path):
+			with open(meta_path) as f:
+				if json.load(f) != meta:
+					raise ValueError("{} holds a log with another layout.".format(path))
+		else:
+			with open(meta_path, "w") as f:
+				json.dump(meta, f)
+		self._files = dict((name, open(os.path.join(path, name + ".bin"), "ab")) for name in columns)
+
+	def append(self, block):
+		"""
+		Appends the iterations of an OutcomeBlock.
+		"""
+		for name, shape in columns.items():
+			rows = np.ascontiguousarray(getattr(block, name), dtype=np.int8)
+			if rows.shape[1:] != shape:
+				raise ValueError("Rows of {} must have shape {}.".format(name, shape))
+			rows.tofile(self._files[name])
+
+	def close(self):
+		for f in self._files.values():
+			f.close()
+
+
+class OutcomeLog(object):
+	"""
+	Reads a directory written by OutcomeWriter. Every column is an attribute holding
+	a read only (iterations,) + shape NumPy array mapped onto its file, so nothing is
+	copied. meta has the layout, as in meta.json. A row being written is left out.
+	"""
+	def __init__(self, path):
+		with open(os.path.join(path, "meta.json")) as f:
+			self.meta = json.load(f)
+		sizes = dict((name, os.path.getsize(os.path.join(path, name + ".bin")) // int(np.prod(shape)))
+			for name, shape in columns.items())
+		self.iterations = min(sizes.values())
+		for name, shape in columns.items():
+			if self.iterations == 0:
+				rows = np.empty((0,) + shape, dtype=np.int8)
+			else:
+				rows = np.memmap(os.path.join(path, name + ".bin"), dtype=np.int8, mode="r", shape=(self.iterations,) + shape)
+			setattr(self, name, rows)
+
+
+if __name__ == '__main__':
+	import sys
+	import time
+	log = OutcomeLog(sys.argv[1])
+	start = time.time()
+	champions = np.bincount(log.knockout[:, len(bracket.wiring) - 1], minlength=len(fd.teams))
+	print("{} iterations, champions counted in {:.3f}s".format(log.iterations, time.time() - start))
+	for team in np.argsort(-champions)[:8]:
+		print("{} {:.4f}".format(fd.teams[team], champions[team] / log.iterations))
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2018 by Instituto de Cálculo, http://www.ic.fcen.uba.ar/
+
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+# Coded by Saveliy Vasiliev for project 301060 (https://301060.exactas.uba.ar/)
+
+import multiprocessing
+import os
+import simulator as sim
+import batchsimulator as bsim
+import config
+
+
+def _run_shard(args):
+	engine, group_matches, knockout_matches, iterations, seed = args
+	return engine(group_matches, knockout_matches, iterations, verbose=False, seed=seed)._counters()
+
+
+class ParallelSimulator(sim.Simulator):
+	"""
+	Simulator that splits the iterations in shards and runs them in a pool of processes.
+	Each shard is an independent run of engine (Simulator or BatchSimulator) and its
+	counters are merged into this one, so the probs_* interface is the same.
+	Every shard gets its own stream spawned from the seed. The shards don't depend on
+	the number of processes, so a seeded run gives the same result with any pool size.
+	Instance callbacks are not supported since the shards run in other processes.
+	"""
+	def __init__(self, group_matches, knockout_matches, iterations, processes=None, engine=bsim.BatchSimulator,
+		shards=64, verbose=True, seed=None, tolerance=None, tracked=("probs_champion", "probs_group_position"),
+		progress=None):
+		"""
+		processes: size of the pool, defaults to the number of cores.
+		engine: the simulator class that runs each shard.
+		shards: number of pieces the iterations are split in. With a tolerance, it is
+			checked after each shard (in order) and the pool stops once it is reached.
+		"""
+		self._processes = processes or os.cpu_count()
+		self._engine = engine
+		self._shards = shards
+		super().__init__(group_matches, knockout_matches, iterations, verbose=verbose, seed=seed,
+			tolerance=tolerance, tracked=tracked, progress=progress)
+
+
+	def _shard_sizes(self):
+		shards = min(self._iterations, self._shards) or 1
+		sizes = [self._iterations // shards] * shards
+		for i in range(self._iterations % shards):
+			sizes[i] += 1
+		return sizes
+
+
+	def _run(self):
+		sizes = self._shard_sizes()
+		seeds = self._seed_sequence.spawn(len(sizes))
+		shards = [(self._engine, self._group_matches, self._knockout_matches, n, seed) for n, seed in zip(sizes, seeds)]
+		done = 0
+		self._update_progress(done)
+		with multiprocessing.Pool(self._processes) as pool:
+			for (_, _, _, n, _), counters in zip(shards, pool.imap(_run_shard, shards)):
+				self._merge_counters(counters)
+				done += n
+				self._update_progress(done)
+				if self._precise_enough(done):
+					self._iterations = done
+					self._update_progress(done)
+					break
+
+
+if __name__ == '__main__':
+	import time
+	for processes in [1, os.cpu_count()]:
+		start = time.time()
+		psim = ParallelSimulator([], {}, config.iterations, processes=processes, verbose=False, seed=2018)
+		print("{} processes: {:.2f}s, Prob_champion(BRA) = {}".format(
+			processes, time.time() - start, psim.probs_champion()["BRA"]))
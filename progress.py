@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2018 by Instituto de Cálculo, http://www.ic.fcen.uba.ar/
+
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+# Coded by Saveliy Vasiliev for project 301060 (https://301060.exactas.uba.ar/)
+
+import sys
+import time
+import config
+import logs
+
+logger = logs.module_logger(__name__, 'log/progress.log')
+
+
+class Status(object):
+	"""
+	What a reporter gets: iterations done out of total, elapsed seconds, rate
+	(iterations per second), eta (seconds left, None before the first iteration),
+	precision (see Simulator.precision, None when unknown) and whether it finished.
+	"""
+	def __init__(self, label, done, total, elapsed, precision, finished):
+		self.label = label
+		self.done = done
+		self.total = total
+		self.elapsed = elapsed
+		self.rate = done / elapsed if elapsed > 0 else 0.0
+		self.eta = (total - done) / self.rate if self.rate > 0 else None
+		self.precision = precision
+		self.finished = finished
+
+
+class Progress(object):
+	"""
+	Progress of a run, reported at most once every interval seconds (and always when
+	it finishes) whatever the number of updates, so it can be updated from hot loops.
+	"""
+	def __init__(self, reporter, label="Simulation", interval=None):
+		"""
+		reporter: any of the reporters of this module (see reporter()).
+		interval: seconds between reports, config.progress_interval by default.
+		"""
+		self._reporter = reporter
+		self._label = label
+		self._interval = config.progress_interval if interval is None else interval
+		self._start = time.monotonic()
+		self._next = 0.0
+
+	def update(self, done, total, precision=None):
+		"""
+		precision: a function returning the current precision, only called when reporting.
+		"""
+		now = time.monotonic()
+		finished = done >= total
+		if now < self._next and not finished:
+			return
+		self._next = now + self._interval
+		self._reporter.report(Status(self._label, done, total, now - self._start,
+			precision() if precision is not None and done > 0 else None, finished))
+
+
+class NoReporter(object):
+	def report(self, status):
+		pass
+
+
+class TerminalBar(object):
+	"""
+	Progress bar redrawn in place on a terminal (stdout by default).
+	"""
+	def __init__(self, stream=None, length=40):
+		self._stream = stream
+		self._length = length
+		self._last = 0
+
+	def report(self, status):
+		stream = self._stream or sys.stdout
+		progress = status.done / status.total if status.total else 1
+		block = int(round(self._length * progress))
+		msg = "{0}: [{1}] {2:.2f}% ({3} / {4}) {5:.0f} it/s".format(status.label,
+			"#" * block + "-" * (self._length - block), round(progress * 100, 4), status.done, status.total, status.rate)
+		if status.precision is not None:
+			msg += " +-{:.4f}".format(status.precision)
+		if status.eta is not None and not status.finished:
+			msg += " ETA {:.0f}s".format(status.eta)
+		# spaces over what is left of a longer previous line
+		msg, self._last = "\r" + msg.ljust(self._last), len(msg)
+		if status.finished:
+			msg += " DONE\r\n"
+		stream.write(msg)
+		stream.flush()
+
+
+class LogReporter(object):
+	"""
+	Reports to a logger (the one of this module by default) at level INFO, with the
+	fields of the Status in the "progress" attribute of the log records.
+	"""
+	def __init__(self, log=None):
+		self._log = log or logger
+
+	def report(self, status):
+		self._log.info("%s: %d / %d iterations, %.0f it/s, ETA %s, precision %s%s", status.label, status.done,
+			status.total, status.rate, "-" if status.eta is None else "{:.1f}s".format(status.eta),
+			"-" if status.precision is None else "{:.4f}".format(status.precision),
+			", done" if status.finished else "", extra={"progress": vars(status)})
+
+
+class CallbackReporter(object):
+	"""
+	Calls function with every Status.
+	"""
+	def __init__(self, function):
+		self._function = function
+
+	def report(self, status):
+		self._function(status)
+
+
+reporters = {"bar": TerminalBar, "log": LogReporter, "none": NoReporter}
+
+
+def reporter(progress, verbose=True):
+	"""
+	The reporter for progress: a reporter, a function (for a CallbackReporter), a name
+	in reporters or None for config.progress, or "none" when not verbose. A "bar" from
+	config.progress becomes "log" when stdout is not a terminal (a server or cron job).
+	"""
+	if not verbose:
+		return NoReporter()
+	if progress is None:
+		progress = config.progress
+		if progress == "bar" and not sys.stdout.isatty():
+			progress = "log"
+	if isinstance(progress, str):
+		return reporters[progress]()
+	if hasattr(progress, "report"):
+		return progress
+	return CallbackReporter(progress)
+
+
+if __name__ == '__main__':
+	for name in ["bar", "log"]:
+		progress = Progress(reporter(name), interval=0.2)
+		for i in range(0, 1000001, 1000):
+			progress.update(i, 1000000, lambda: 1 / (i + 1) ** 0.5)
+			time.sleep(0.001)
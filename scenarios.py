@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2018 by Instituto de Cálculo, http://www.ic.fcen.uba.ar/
+
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+# Coded by Saveliy Vasiliev for project 301060 (https://301060.exactas.uba.ar/)
+
+import progress as prg
+import numpy as np
+import batchsimulator as bsim
+import simulator as sim
+import bracket
+import fixture_data as fd
+import match
+
+
+class PairedScenarios(object):
+	"""
+	Simulates several scenarios (sets of known matches) with common random numbers:
+	every iteration draws the same uniforms in all the scenarios, so the matches that
+	are unknown in two scenarios get the same score in both and the differences
+	between scenarios are not buried under the noise of independent runs.
+	The iterations are run in batches, each one with its own stream, and the standard
+	errors of the differences come from the spread of the differences over the
+	batches (batch means), which accounts for the coupling.
+	"""
+	def __init__(self, scenarios, iterations, batches=50, verbose=True, seed=None, progress=None):
+		"""
+		scenarios: list of (group_matches, knockout_matches), the first one being the
+			reference of delta().
+		iterations: iterations per scenario, rounded up to a multiple of batches.
+		batches: number of batches, at least 2.
+		seed: an int or a numpy SeedSequence, as in Simulator.
+		progress: as in Simulator, reported in batches.
+		"""
+		self._batch_size = -(-iterations // batches)
+		self._batches = batches
+		self._progress = prg.Progress(prg.reporter(progress, verbose), label="Scenarios")
+		self._seed_sequence = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+		self._simulators = [bsim.BatchSimulator(group_matches, knockout_matches, 0, block_size=self._batch_size, verbose=False)
+			for group_matches, knockout_matches in scenarios]
+		# scenario -> (batches, statistics) array with the probabilities of each batch, see _statistics
+		self._batch_probs = np.zeros((len(scenarios), batches, len(_statistics(self._simulators[0]))))
+		self._run()
+
+
+	def _run(self):
+		for b, seed in enumerate(self._seed_sequence.spawn(self._batches)):
+			for s, simulator in enumerate(self._simulators):
+				before = _statistics(simulator)
+				simulator.run(self._batch_size, np.random.default_rng(seed))
+				self._batch_probs[s, b] = (_statistics(simulator) - before) / self._batch_size
+			self._progress.update(b + 1, self._batches)
+
+
+	def seed(self):
+		return self._seed_sequence.entropy
+
+	def simulator(self, scenario):
+		"""
+		The BatchSimulator of scenario (an index of scenarios), for its probs_* methods.
+		"""
+		return self._simulators[scenario]
+
+	def delta(self, name, scenario=1):
+		"""
+		Change of the probabilities of the probs_* method name (probs_champion,
+		probs_second, probs_third, probs_group_position or probs_reaching_node) from
+		the first scenario to scenario. The result has the shape of that method with
+		(delta, standard error) values; for probs_reaching_node only the teams that
+		reach the node in either scenario are listed.
+		"""
+		differences = self._batch_probs[scenario] - self._batch_probs[0]
+		deltas = differences.mean(axis=0)
+		errors = differences.std(axis=0, ddof=1) / np.sqrt(self._batches)
+		values = dict((stat, (float(d), float(e))) for stat, d, e in zip(_statistic_names(), deltas, errors))
+		reached = self._batch_probs[[0, scenario]].any(axis=(0, 1))
+		n_teams = len(fd.teams)
+		if name == "probs_group_position":
+			return dict((gname, dict((team, dict((str(pos + 1), values[(name, team, pos)]) for pos in range(4)))
+				for team in teams)) for gname, teams in fd.groups.items())
+		if name == "probs_reaching_node":
+			probs = {}
+			for k, (node, _, _) in enumerate(bracket.wiring):
+				offset = k * n_teams
+				probs[node] = dict((team, values[(name, node, team)]) for t, team in enumerate(fd.teams) if reached[offset + t])
+			return probs
+		return dict((team, values[(name, team)]) for team in fd.teams)
+
+
+def _statistics(simulator):
+	# the counters of simulator that delta() supports, as a flat array (names in _statistic_names)
+	nodes = [sim.node_index[node] for node, _, _ in bracket.wiring]
+	return np.concatenate([simulator._team_in_node_count[nodes].ravel(), simulator._team_in_group_position.ravel(),
+		simulator._champion_count, simulator._second_place_count, simulator._third_place_count])
+
+
+def _statistic_names():
+	names = [("probs_reaching_node", node, team) for node, _, _ in bracket.wiring for team in fd.teams]
+	names += [("probs_group_position", team, pos) for team in fd.teams for pos in range(4)]
+	for name in ["probs_champion", "probs_second", "probs_third"]:
+		names += [(name, team) for team in fd.teams]
+	return names
+
+
+if __name__ == '__main__':
+	import time
+	start = time.time()
+	scenarios = PairedScenarios([([], {}), ([match.Match("RUS", "KSA", 5, 0)], {})], 100000)
+	print("Paired scenarios in {:.2f}s".format(time.time() - start))
+	for team, (delta, error) in sorted(scenarios.delta("probs_champion").items(), key=lambda x: -abs(x[1][0]))[:8]:
+		print("Prob_champion({}) changes by {:+.4f} +- {:.4f}".format(team, delta, error))
+	pprint_deltas = scenarios.delta("probs_group_position")["A"]
+	for team in pprint_deltas:
+		print(team, dict((pos, "{:+.4f}".format(d)) for pos, (d, _) in pprint_deltas[team].items()))
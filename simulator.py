@@ -26,43 +26,87 @@
 
 import match
 import deterministicnode as dnode
+import bracket
 import group
 import estimations as est
 import fixture_data as fd
 import pprint
 import config
-import sys
+import random
+import numpy as np
+import outcomelog
+import progress as prg
+
+ko_node_labels = bracket.labels
+node_index = dict((nodeid, i) for i, nodeid in enumerate(ko_node_labels))
+# z of the confidence intervals used for stopping (95%)
+ci_z = 1.96
+# groups in the order of the outcome arrays (see outcomelog.py)
+group_names = sorted(fd.groups)
 
 class Simulator(object):
 	"""
 	Simulator that supports pre-defined inputs. Runs and stores statistics for each team.
+	Internally teams are handled by their ids in fd.team_ids (also in the nodes and groups
+	given to the instance callbacks, fd.teams maps them back), the probs_* methods use the codes.
 	"""
-	def __init__(self, group_matches, knockout_matches, iterations, instance_callbacks=[]):
+	def __init__(self, group_matches, knockout_matches, iterations, instance_callbacks=[], verbose=True, seed=None,
+		tolerance=None, tracked=("probs_champion", "probs_group_position"), batch_callbacks=[], batch_size=10000,
+		progress=None):
 		"""
 		group_matches: the set of matches already played. The rest will be generated 
 			based on the data in fixture_data.py
 		knockout_matches: a dictionary {slot_label:match}, see implementation of _run_instance for the ids used.
 			Yeah, I know, it's not that accurate, you're welcome to tidy this up :)
+		verbose: whether to report the progress.
+		progress: how, see progress.reporter (config.progress by default).
+		seed: an int or a numpy SeedSequence. Runs with the same seed are identical; when it
+			is None a fresh one is drawn, it can be read with seed() for repeating the run.
+		tolerance: when given, the simulation stops as soon as the confidence intervals
+			of all the tracked probabilities are narrower than +-tolerance (see precision),
+			iterations being the maximum.
+		tracked: names of the probs_* methods whose probabilities are checked against
+			tolerance, any of probs_champion, probs_second, probs_third,
+			probs_group_position and probs_reaching_node.
+		batch_callbacks: functions called with an outcomelog.OutcomeBlock holding the
+			outcomes of the last batch_size iterations (the last block may be smaller).
+			Unlike instance callbacks they don't need the Match, Group and
+			DeterministicNode objects, so BatchSimulator supports them too.
 		"""
-		ko_node_labels = ["A1","A2","B1","B2","C1","C2","D1","D2","E1","E2","F1","F2","G1","G2","H1","H2",
-						  "S1","S2","S3","S4","S5","S6","S7","S8","Q1","Q2","Q3","Q4","SF1","SF2","Final"]
 		self._group_matches = group_matches
 		self._known_group_pairs = []
 		self._build_known_group_pairs()
+		self._build_group_fixtures()
 		self._knockout_matches = knockout_matches
-		self._team_in_node_count = dict(zip(ko_node_labels, 
-			[{} for _ in range(len(ko_node_labels))]))
-		self._teams_in_node_count = dict(zip(ko_node_labels, 
-			[{} for _ in range(len(ko_node_labels))]))
-		self._team_in_group_position = dict(zip(fd.groups.keys(), 
-			[{} for _ in range(len(fd.groups.keys()))]))
-		teams = [team for group_teams in fd.groups.values() for team in group_teams]
-		self._champion_count = dict(zip(teams, [0] * len(teams)))
-		self._second_place_count = dict(zip(teams, [0] * len(teams)))
-		self._third_place_count = dict(zip(teams, [0] * len(teams)))
-		self._initialize_group_counters()
+		self._knockout_id_matches = dict((slot, _with_team_ids(m)) for slot, m in knockout_matches.items())
+		# the callbacks get whole matches, otherwise only the winners are needed
+		self._bracket = bracket.CompiledBracket(self._knockout_id_matches,
+			scores=bool(instance_callbacks) or config.knockout_mode == "score")
+		# (group, position - 1) of the team in each leaf of the bracket
+		self._leaf_sources = [(leaf[0], int(leaf[1]) - 1) for leaf in bracket.leaves]
+		n = len(fd.teams)
+		# Indexed by node (see node_index) and team id (and rival id). They are floats
+		# since BatchSimulator may count probabilities instead of hits (config.rao_blackwell).
+		self._team_in_node_count = np.zeros((len(ko_node_labels), n))
+		self._teams_in_node_count = np.zeros((len(ko_node_labels), n, n))
+		# Indexed by team id and position - 1, every team belongs to a single group.
+		self._team_in_group_position = np.zeros((n, 4))
+		self._champion_count = np.zeros(n)
+		self._second_place_count = np.zeros(n)
+		self._third_place_count = np.zeros(n)
+		# Flat indices of the increments of each counter not added yet, see _flush_counters.
+		self._pending = tuple([] for _ in self._counters())
 		self._iterations = iterations
+		self._tolerance = tolerance
+		self._tracked = tracked
 		self._instance_callbacks = instance_callbacks
+		self._batch_callbacks = batch_callbacks
+		self._batch_size = batch_size
+		# rows of the OutcomeBlock given to the batch callbacks, see _record_outcome
+		self._outcomes = tuple([] for _ in range(5))
+		self._progress = prg.Progress(prg.reporter(progress, verbose))
+		self._seed_sequence = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+		self._rng = random.Random(int.from_bytes(self._seed_sequence.generate_state(4).tobytes(), "little"))
 		self._run()
 
 
@@ -70,78 +114,112 @@ class Simulator(object):
 		update_step = 100
 		for i in range(self._iterations):
 			if i % update_step == 0:
+				self._flush_counters()
 				self._update_progress(i)
+				if self._precise_enough(i):
+					self._iterations = i
+					break
 			self._run_instance()
+		self._flush_counters()
+		self._flush_outcomes()
 		self._update_progress(self._iterations)
 
 
+	def _precise_enough(self, iterations):
+		"""
+		Whether the tolerance was set and reached after the given number of iterations.
+		"""
+		return self._tolerance is not None and iterations > 0 and self._precision(iterations) < self._tolerance
+
+
+	def _precision(self, iterations):
+		"""
+		Widest half-width of the confidence intervals of the tracked probabilities. The
+		binomial standard error is adjusted as Agresti-Coull do, so that probabilities
+		still at 0 or 1 don't look exact. It is an upper bound for the knockout
+		counters that add probabilities instead of hits (config.rao_blackwell).
+		"""
+		counters = {"probs_champion": self._champion_count, "probs_second": self._second_place_count,
+			"probs_third": self._third_place_count, "probs_group_position": self._team_in_group_position,
+			"probs_reaching_node": self._team_in_node_count[len(bracket.leaves):]}
+		n = iterations + ci_z ** 2
+		p = np.concatenate([counters[name].ravel() for name in self._tracked])
+		p = (p + ci_z ** 2 / 2) / n
+		return ci_z * float(np.sqrt((p * (1 - p)).max() / n))
+
+
+	def iterations(self):
+		"""
+		Number of iterations run.
+		"""
+		return self._iterations
+
+	def precision(self):
+		"""
+		Half-width of the widest confidence interval of the tracked probabilities.
+		"""
+		return self._precision(self._iterations)
+
+
 	def _update_progress(self, i):
-		length = 40
-		progress = i / self._iterations
-		block = int(round(length*progress))
-		msg = "\rSimulation: [{0}] {1:.2f}% ({2} / {3})".format(
-			"#"*block + "-"*(length-block), 
-			round(progress*100, 4),
-			i,
-			self._iterations)
-		if progress >= 1: 
-			msg += " DONE\r\n"
-		sys.stdout.write(msg)
-		sys.stdout.flush()
-
-	def _inc_team_in_node_count(self, nodeid, team):
-		if team not in self._team_in_node_count[nodeid]:
-			self._team_in_node_count[nodeid][team] = 0
-		self._team_in_node_count[nodeid][team] += 1
-
-	def _inc_teams_in_node_count(self, nodeid, team1, team2):
-		if team1 not in self._teams_in_node_count[nodeid]:
-			self._teams_in_node_count[nodeid][team1] = {}
-		if team2 not in self._teams_in_node_count[nodeid][team1]:
-			self._teams_in_node_count[nodeid][team1][team2] = 0
-		self._teams_in_node_count[nodeid][team1][team2] += 1
-		
-		if team2 not in self._teams_in_node_count[nodeid]:
-			self._teams_in_node_count[nodeid][team2] = {}
-		if team1 not in self._teams_in_node_count[nodeid][team2]:
-			self._teams_in_node_count[nodeid][team2][team1] = 0
-		self._teams_in_node_count[nodeid][team2][team1] += 1
-
-
-	def _update_counters(self, knockout_phase, groups, third_place=None):
-		if knockout_phase.id != "Final":
-			raise ValueError("knockout_phase has id != 'Final'.") 
-
-		self._champion_count[knockout_phase.winner()] += 1
-		self._second_place_count[knockout_phase.loser()] += 1
-		if third_place:
-			self._third_place_count[third_place.winner()] += 1
-
-		for node in knockout_phase:
-			self._inc_team_in_node_count(node.id, node.winner())
-			self._inc_team_in_node_count(node.id, node.loser())
-			self._inc_teams_in_node_count(node.id, node.winner(), node.loser())
-		for gname, group in groups.items():
-			self._team_in_group_position[gname][group.first()]["1"] += 1
-			self._team_in_group_position[gname][group.second()]["2"] += 1
-			self._team_in_group_position[gname][group.third()]["3"] += 1
-			self._team_in_group_position[gname][group.fourth()]["4"] += 1
+		self._progress.update(i, self._iterations, lambda: self._precision(i))
+
+	def seed(self):
+		"""
+		The entropy of the seed of this run.
+		"""
+		return self._seed_sequence.entropy
+
+	def _counters(self):
+		return (self._team_in_node_count, self._teams_in_node_count, self._team_in_group_position,
+			self._champion_count, self._second_place_count, self._third_place_count)
+
+	def _merge_counters(self, counters):
+		"""
+		Adds counters (as returned by _counters of another simulation over the same known matches) to this one.
+		"""
+		for total, counts in zip(self._counters(), counters):
+			total += counts
+
+	def _flush_counters(self):
+		for counter, hits in zip(self._counters(), self._pending):
+			if hits:
+				np.add.at(counter.reshape(-1), hits, 1)
+				del hits[:]
+
+	def _update_counters(self, groups):
+		b = self._bracket
+		n = len(fd.teams)
+		final = node_index["Final"]
+		self._pending[3].append(b.winners[final])
+		self._pending[4].append(b.losers[final])
+		self._pending[5].append(b.winners[b.third_place])
+
+		# The slots of the nodes are numbered as in ko_node_labels.
+		for k in range(len(bracket.leaves), len(ko_node_labels)):
+			team1, team2 = b.team1[k], b.team2[k]
+			self._pending[0].append(k * n + team1)
+			self._pending[0].append(k * n + team2)
+			self._pending[1].append((k * n + team1) * n + team2)
+			self._pending[1].append((k * n + team2) * n + team1)
+		for group in groups.values():
+			for pos, team in enumerate(group.result()):
+				self._pending[2].append(team * 4 + pos)
 
 	def _build_instance_group_matches(self, group_name):
 		ms = []
-		for fixture_match in fd.group_pairs[group_name]:
-			if fixture_match in self._known_group_pairs:
-				known_match = next(km for km in self._group_matches if {km.team1, km.team2} == fixture_match)
-				ms.append(match.Match.from_match(known_match))
+		for known_match, team1, team2 in self._group_fixtures[group_name]:
+			if known_match is not None:
+				ms.append(known_match)
 			else:
-				it = iter(fixture_match)
-				ms.append(match.Match(next(it), next(it)))
+				goals1, goals2 = est.random_goals(team1, team2, self._rng)
+				ms.append(match.MatchResult(team1, team2, goals1, goals2))
 		return ms
 
 	def _build_instance_groups(self):
 		gs = {}
 		for g in fd.groups:
-			gs[g] = group.Group(self._build_instance_group_matches(g), id = g)
+			gs[g] = group.Group(self._build_instance_group_matches(g), id = g, rng=self._rng)
 		return gs
 
 
@@ -150,108 +228,124 @@ class Simulator(object):
 			self._known_group_pairs.append({m.team1, m.team2})
 
 
-	def _initialize_group_counters(self):
-		# The indexing is group,team,position.
-		for gname, teams in fd.groups.items():
-			for team in teams:
-				self._team_in_group_position[gname][team] = dict(zip(["1","2","3","4"], [0,0,0,0]))
+	def _build_group_fixtures(self):
+		# group -> [(known match as a MatchResult with team ids or None, team1 id, team2 id)]
+		self._group_fixtures = {}
+		for gname, pairs in fd.group_pairs.items():
+			self._group_fixtures[gname] = []
+			for fixture_match in pairs:
+				team1, team2 = sorted(fd.team_ids[team] for team in fixture_match)
+				known_match = None
+				if fixture_match in self._known_group_pairs:
+					known_match = match.MatchResult.from_match(
+						_with_team_ids(next(km for km in self._group_matches if {km.team1, km.team2} == fixture_match)))
+				self._group_fixtures[gname].append((known_match, team1, team2))
 
 
 	def _run_instance(self):
 		groups = self._build_instance_groups()
+		self._bracket.resolve([groups[g].result()[pos] for g, pos in self._leaf_sources], self._rng)
+		self._update_counters(groups)
+		if self._batch_callbacks:
+			self._record_outcome(groups)
+		if self._instance_callbacks:
+			final, third_place = self._knockout_tree()
+			for callback in self._instance_callbacks:
+				callback(final, groups, third_place=third_place)
 
-		a1 = dnode.DeterministicNode("A1", fn_team=groups["A"].first())
-		a2 = dnode.DeterministicNode("A2", fn_team=groups["A"].second())
-		b1 = dnode.DeterministicNode("B1", fn_team=groups["B"].first())
-		b2 = dnode.DeterministicNode("B2", fn_team=groups["B"].second())
-		c1 = dnode.DeterministicNode("C1", fn_team=groups["C"].first())
-		c2 = dnode.DeterministicNode("C2", fn_team=groups["C"].second())
-		d1 = dnode.DeterministicNode("D1", fn_team=groups["D"].first())
-		d2 = dnode.DeterministicNode("D2", fn_team=groups["D"].second())
-		e1 = dnode.DeterministicNode("E1", fn_team=groups["E"].first())
-		e2 = dnode.DeterministicNode("E2", fn_team=groups["E"].second())
-		f1 = dnode.DeterministicNode("F1", fn_team=groups["F"].first())
-		f2 = dnode.DeterministicNode("F2", fn_team=groups["F"].second())
-		g1 = dnode.DeterministicNode("G1", fn_team=groups["G"].first())
-		g2 = dnode.DeterministicNode("G2", fn_team=groups["G"].second())
-		h1 = dnode.DeterministicNode("H1", fn_team=groups["H"].first())
-		h2 = dnode.DeterministicNode("H2", fn_team=groups["H"].second())
-
-		s1 = dnode.DeterministicNode("S1", fn1=a1, fn2=b2)
-		s2 = dnode.DeterministicNode("S2", fn1=c1, fn2=d2)
-		s3 = dnode.DeterministicNode("S3", fn1=b1, fn2=a2)
-		s4 = dnode.DeterministicNode("S4", fn1=d1, fn2=c2)
-		s5 = dnode.DeterministicNode("S5", fn1=e1, fn2=f2)
-		s6 = dnode.DeterministicNode("S6", fn1=g1, fn2=h2)
-		s7 = dnode.DeterministicNode("S7", fn1=f1, fn2=e2)
-		s8 = dnode.DeterministicNode("S8", fn1=h1, fn2=g2)
-
-		q1 = dnode.DeterministicNode("Q1", fn1=s1, fn2=s2)
-		q2 = dnode.DeterministicNode("Q2", fn1=s5, fn2=s6)
-		q3 = dnode.DeterministicNode("Q3", fn1=s3, fn2=s4)
-		q4 = dnode.DeterministicNode("Q4", fn1=s7, fn2=s8)
-
-		sf1 = dnode.DeterministicNode("SF1", fn1=q1, fn2=q2)
-		sf2 = dnode.DeterministicNode("SF2", fn1=q3, fn2=q4)
-
-		
-		final = dnode.DeterministicNode("Final", fn1=sf1, fn2=sf2)
-		
-		final.set_matches(self._knockout_matches)
-
-		third_place_candidate_1 = dnode.DeterministicNode("ThirdPlace1", fn_team=sf1.loser())
-		third_place_candidate_2 = dnode.DeterministicNode("ThirdPlace2", fn_team=sf2.loser())
-		third_place = dnode.DeterministicNode("ThirdPlace", fn1=third_place_candidate_1, fn2=third_place_candidate_2)
-		third_place.set_matches(self._knockout_matches)
-
-		self._update_counters(final, groups, third_place=third_place)
-		for callback in self._instance_callbacks:
-			callback(final, groups, third_place=third_place)
+
+	def _record_outcome(self, groups):
+		"""
+		Adds the iteration just played to the rows of the next OutcomeBlock, which
+		is given to the batch callbacks once it has batch_size of them.
+		"""
+		rankings, group_goals, knockout_goals, knockout, losers = self._outcomes
+		rankings.append([groups[gname].result() for gname in group_names])
+		group_goals.append([(m.score()[team1], m.score()[team2]) for gname in group_names
+			for m, (_, team1, team2) in zip(groups[gname].matches(), self._group_fixtures[gname])])
+		b = self._bracket
+		nodes = slice(len(bracket.leaves), len(b.labels))
+		knockout_goals.append([(-1, -1) if g1 is None else (g1, g2) for g1, g2 in zip(b.goals1[nodes], b.goals2[nodes])])
+		knockout.append(b.winners[nodes])
+		losers.append(b.losers[nodes])
+		if len(rankings) == self._batch_size:
+			self._flush_outcomes()
+
+	def _flush_outcomes(self):
+		if not self._outcomes[0]:
+			return
+		block = outcomelog.OutcomeBlock(*self._outcomes)
+		for rows in self._outcomes:
+			del rows[:]
+		for callback in self._batch_callbacks:
+			callback(block)
+
+
+	def _knockout_tree(self):
+		"""
+		Returns the DeterministicNode trees (final, third_place) of the knockout stage
+		just resolved in self._bracket. Only built for the instance callbacks.
+		"""
+		b = self._bracket
+		nodes = {}
+		matches = {}
+		for k, label in enumerate(b.labels):
+			if b.child1[k] is None:
+				nodes[label] = dnode.DeterministicNode(label, fn_team=b.winners[k])
+				continue
+			if k == b.third_place:
+				fn1 = dnode.DeterministicNode("ThirdPlace1", fn_team=b.team1[k])
+				fn2 = dnode.DeterministicNode("ThirdPlace2", fn_team=b.team2[k])
+			else:
+				fn1, fn2 = nodes[b.labels[b.child1[k]]], nodes[b.labels[b.child2[k]]]
+			nodes[label] = dnode.DeterministicNode(label, fn1=fn1, fn2=fn2, rng=self._rng)
+			matches[label] = b.pinned[k] or match.Match(b.team1[k], b.team2[k], b.goals1[k], b.goals2[k],
+				winner=b.winners[k], knockout=True, id=label)
+		final = nodes["Final"]
+		third_place = nodes["ThirdPlace"]
+		final.set_matches(matches)
+		third_place.set_matches(matches)
+		return final, third_place
 
 
 	def probs_reaching_node(self):
-		# node x team
+		# node x team; only the teams that reached the node are listed
 		probs = {}
-		for nodeid in self._team_in_node_count:
-			if self._team_in_node_count[nodeid]:
-				probs[nodeid] = {}
-			for team in self._team_in_node_count[nodeid]:
-				probs[nodeid][team] = self._team_in_node_count[nodeid][team] / self._iterations
+		for nodeid, counts in zip(ko_node_labels, self._team_in_node_count.tolist()):
+			if any(counts):
+				probs[nodeid] = {fd.teams[team]: c / self._iterations for team, c in enumerate(counts) if c}
 		return probs
 
 
 	def probs_pair_playing_at_node(self):
 		# node x team1 x team2: P(team1 faces team2 given that team1 reached node1)
 		probs = {}
-
-		for nodeid in self._teams_in_node_count:
-			if self._teams_in_node_count[nodeid]:
+		for nodeid, counts, reached in zip(ko_node_labels, self._teams_in_node_count.tolist(), self._team_in_node_count.tolist()):
+			if any(reached):
 				probs[nodeid] = {}
-			for team1 in self._teams_in_node_count[nodeid]:
-				probs[nodeid][team1] = {}
-				for team2 in self._teams_in_node_count[nodeid][team1]:
-					probs[nodeid][team1][team2] = self._teams_in_node_count[nodeid][team1][team2] / self._team_in_node_count[nodeid][team1]
+			for team1, rivals in enumerate(counts):
+				if reached[team1]:
+					probs[nodeid][fd.teams[team1]] = {fd.teams[team2]: c / reached[team1] for team2, c in enumerate(rivals) if c}
 		return probs
 
 	def probs_group_position(self):
 		# group x team x position; estimated as #(team in pos) / #(iterations)
 		probs = {}
-		for gname in self._team_in_group_position:
+		for gname, teams in fd.groups.items():
 			probs[gname] = {}
-			for team in self._team_in_group_position[gname]:
-				probs[gname][team] = {}
-				for pos in self._team_in_group_position[gname][team]:
-					probs[gname][team][pos] = self._team_in_group_position[gname][team][pos] / self._iterations
+			for team in teams:
+				counts = self._team_in_group_position[fd.team_ids[team]].tolist()
+				probs[gname][team] = {str(pos + 1): c / self._iterations for pos, c in enumerate(counts)}
 		return probs
 
 	def probs_champion(self):
-		return {team: self._champion_count[team] / self._iterations for team in self._champion_count}
+		return {team: c / self._iterations for team, c in zip(fd.teams, self._champion_count.tolist())}
 
 	def probs_second(self):
-		return {team: self._second_place_count[team] / self._iterations for team in self._second_place_count}
+		return {team: c / self._iterations for team, c in zip(fd.teams, self._second_place_count.tolist())}
 
 	def probs_third(self):
-		return {team: self._third_place_count[team] / self._iterations for team in self._third_place_count}
+		return {team: c / self._iterations for team, c in zip(fd.teams, self._third_place_count.tolist())}
 
 	def __str__(self):
 		return "Simulator: {0}\nKnown group matches: {1}\nKnown knockout matches:{2}".format(
@@ -261,11 +355,21 @@ class Simulator(object):
 		)
 
 
+def _with_team_ids(m):
+	"""
+	Copy of the played match m with the team ids instead of the team codes.
+	"""
+	score = m.score()
+	winner = fd.team_ids[m.winner()] if m.winner() is not None else None
+	return match.Match(fd.team_ids[m.team1], fd.team_ids[m.team2], score[m.team1], score[m.team2],
+		winner=winner, knockout=m.knockout, id=m.id)
+
+
 if __name__ == '__main__':
 	ma1 = match.Match("RUS", "KSA", 1, 0)
 	ma2 = match.Match("EGY", "URU", 2, 0)
 	def dummy_callback(final_node, groups, third_place):
-		print("The champion is {}".format(final_node.winner()))
+		print("The champion is {}".format(fd.teams[final_node.winner()]))
 	sim = Simulator([], {}, config.iterations, instance_callbacks=[dummy_callback])
 	pppan = sim.probs_pair_playing_at_node()
 	pchamp = sim.probs_champion()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2018 by Instituto de Cálculo, http://www.ic.fcen.uba.ar/
+
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+# Coded by Saveliy Vasiliev for project 301060 (https://301060.exactas.uba.ar/)
+
+import warnings
+import numpy as np
+
+
+class SobolStream(object):
+	"""
+	Scrambled Sobol points served through the random() method of numpy Generators,
+	so that BatchSimulator can use them in place of its pseudo-random stream.
+	Every block of n iterations takes n points of dimension dimension and each call
+	random(size), where the last axis of size is n, hands out the next prod(size) / n
+	coordinates of those points. The first coordinates, which are the most evenly
+	spread, go to the first draws of each iteration (the group matches).
+	Requires SciPy (1.15 or later).
+	"""
+	def __init__(self, dimension, seed=None):
+		"""
+		dimension: uniforms drawn per iteration.
+		seed: an int or a numpy SeedSequence for the scrambling.
+		"""
+		from scipy.stats import qmc
+		self._engine = qmc.Sobol(dimension, scramble=True, rng=np.random.default_rng(seed))
+		self._dimension = dimension
+		self._points = None
+		self._next = dimension
+
+	def random(self, size):
+		size = (size,) if np.isscalar(size) else tuple(size)
+		n = size[-1]
+		columns = int(np.prod(size[:-1]))
+		if self._next == self._dimension:
+			# The blocks are consecutive pieces of one sequence, so the warning about n
+			# not being a power of 2 doesn't apply to them.
+			with warnings.catch_warnings():
+				warnings.simplefilter("ignore", UserWarning)
+				self._points = self._engine.random(n)
+			self._next = 0
+		if len(self._points) != n or self._next + columns > self._dimension:
+			raise ValueError("Draws don't match the blocks of {} iterations of dimension {}.".format(n, self._dimension))
+		u = self._points[:, self._next:self._next + columns]
+		self._next += columns
+		return u.T.reshape(size)
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2018 by Instituto de Cálculo, http://www.ic.fcen.uba.ar/
+
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+# Coded by Saveliy Vasiliev for project 301060 (https://301060.exactas.uba.ar/)
+
+import unittest
+from unittest import mock
+import numpy as np
+import batchsimulator as bsim
+import config
+import exactknockout as ek
+import fixture_data as fd
+import match
+import simulator as sim
+from test_exactknockout import _known_matches
+
+
+def _within(test, p1, n1, p2, n2, msg):
+	# p1 and p2 estimate the same probability: 5 standard errors of their difference apart at most
+	p = (p1 * n1 + p2 * n2) / (n1 + n2)
+	test.assertLess(abs(p1 - p2), 5 * np.sqrt(p * (1 - p) * (1 / n1 + 1 / n2)) + 1e-9, msg)
+
+
+class BatchSimulatorTest(unittest.TestCase):
+
+	def test_agrees_with_simulator(self):
+		group_matches = [match.Match("RUS", "KSA", 5, 0), match.Match("ESP", "POR", 3, 3)]
+		n_object, n_batch = 5000, 100000
+		reference = sim.Simulator(group_matches, {}, n_object, seed=0, verbose=False)
+		batch = bsim.BatchSimulator(group_matches, {}, n_batch, seed=0, verbose=False)
+		for team in fd.teams:
+			_within(self, reference.probs_champion()[team], n_object, batch.probs_champion()[team], n_batch, team)
+		for gname, teams in fd.groups.items():
+			for team in teams:
+				for pos in "1234":
+					_within(self, reference.probs_group_position()[gname][team][pos], n_object,
+						batch.probs_group_position()[gname][team][pos], n_batch, (team, pos))
+
+	def test_played_group_is_certain(self):
+		group_matches = [match.Match("RUS", "KSA", 5, 0), match.Match("EGY", "URU", 0, 1),
+			match.Match("RUS", "EGY", 3, 1), match.Match("URU", "KSA", 1, 0),
+			match.Match("URU", "RUS", 3, 0), match.Match("KSA", "EGY", 2, 1)]
+		batch = bsim.BatchSimulator(group_matches, {}, 1000, seed=0, verbose=False)
+		for team, pos in [("URU", "1"), ("RUS", "2"), ("KSA", "3"), ("EGY", "4")]:
+			self.assertEqual(batch.probs_group_position()["A"][team][pos], 1)
+
+	def test_knockout_modes_agree(self):
+		n = 100000
+		probs = {}
+		for mode in ["winner", "score"]:
+			with mock.patch.object(config, "knockout_mode", mode):
+				probs[mode] = bsim.BatchSimulator([], {}, n, seed=1, verbose=False).probs_champion()
+		for team in fd.teams:
+			_within(self, probs["winner"][team], n, probs["score"][team], n, team)
+
+	def test_rao_blackwell_is_unbiased(self):
+		# both counters land within Monte Carlo error of the exact knockout probabilities
+		n = 100000
+		group_matches = _known_matches(4)
+		exact = ek.ExactKnockout(group_matches)
+		for rao_blackwell in [True, False]:
+			with mock.patch.object(config, "rao_blackwell", rao_blackwell):
+				batch = bsim.BatchSimulator(group_matches, {}, n, seed=2, verbose=False)
+			for node in ["Q1", "SF2", "Final"]:
+				expected, reached = exact.probs_reaching_node()[node], batch.probs_reaching_node()[node]
+				for team in set(expected) | set(reached):
+					p = expected.get(team, 0)
+					self.assertLess(abs(reached.get(team, 0) - p), 5 * np.sqrt(p * (1 - p) / n) + 1e-9,
+						(rao_blackwell, node, team))
+
+	def test_run_adds_iterations(self):
+		simulator = bsim.BatchSimulator([], {}, 0, block_size=300, verbose=False)
+		simulator.run(1000, np.random.default_rng(0))
+		simulator.run(500, np.random.default_rng(1))
+		self.assertEqual(simulator.iterations(), 1500)
+		self.assertAlmostEqual(sum(simulator.probs_champion().values()), 1)
+
+	def test_seed_reproduces(self):
+		probs = [bsim.BatchSimulator([], {}, 2000, seed=7, verbose=False).probs_champion() for _ in range(2)]
+		self.assertEqual(probs[0], probs[1])
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2018 by Instituto de Cálculo, http://www.ic.fcen.uba.ar/
+
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+# Coded by Saveliy Vasiliev for project 301060 (https://301060.exactas.uba.ar/)
+
+import random
+import unittest
+import bracket
+import estimations as est
+import fixture_data as fd
+import match
+
+
+LEAVES = [fd.team_ids[team] for team in ["URU", "RUS", "ESP", "POR", "FRA", "DEN", "CRO", "ARG",
+	"BRA", "SWI", "SWE", "MEX", "BEL", "ENG", "COL", "JPN"]]
+
+
+class CompiledBracketTest(unittest.TestCase):
+
+	def test_resolve_follows_the_wiring(self):
+		compiled = bracket.CompiledBracket({})
+		compiled.resolve(LEAVES, random.Random(0))
+		for k in range(len(bracket.leaves), len(compiled.labels)):
+			self.assertEqual({compiled.winners[k], compiled.losers[k]}, {compiled.team1[k], compiled.team2[k]})
+			self.assertIsNotNone(compiled.goals1[k])
+		sf1, sf2 = compiled.labels.index("SF1"), compiled.labels.index("SF2")
+		third = compiled.third_place
+		self.assertEqual({compiled.team1[third], compiled.team2[third]}, {compiled.losers[sf1], compiled.losers[sf2]})
+
+	def test_pinned_match_is_kept(self):
+		known = match.Match(fd.team_ids["URU"], fd.team_ids["POR"], 2, 1, knockout=True)
+		compiled = bracket.CompiledBracket({"S1": known})
+		for seed in range(20):
+			compiled.resolve(LEAVES, random.Random(seed))
+			k = compiled.labels.index("S1")
+			self.assertEqual((compiled.winners[k], compiled.goals1[k], compiled.goals2[k]), (fd.team_ids["URU"], 2, 1))
+
+	def test_other_teams_at_a_pinned_match_raise(self):
+		known = match.Match(fd.team_ids["URU"], fd.team_ids["POR"], 2, 1, knockout=True)
+		# ESP and POR swapped, so URU meets ESP at S1
+		leaves = list(LEAVES)
+		leaves[bracket.leaves.index("B1")], leaves[bracket.leaves.index("B2")] = fd.team_ids["POR"], fd.team_ids["ESP"]
+		with self.assertRaises(Exception):
+			bracket.CompiledBracket({"S1": known}).resolve(leaves, random.Random(0))
+
+	def test_winner_only_draws(self):
+		compiled = bracket.CompiledBracket({}, scores=False)
+		k = compiled.labels.index("S1")
+		rng = random.Random(1)
+		n = 20000
+		wins = 0
+		for _ in range(n):
+			compiled.resolve(LEAVES, rng)
+			self.assertIsNone(compiled.goals1[k])
+			wins += compiled.winners[k] == LEAVES[0]
+		p = est.winning_probs()[LEAVES[0], LEAVES[bracket.leaves.index("B2")]]
+		self.assertAlmostEqual(wins / n, p, delta=5 * (p * (1 - p) / n) ** 0.5)
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2018 by Instituto de Cálculo, http://www.ic.fcen.uba.ar/
+
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+# Coded by Saveliy Vasiliev for project 301060 (https://301060.exactas.uba.ar/)
+
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+
+class ImportTest(unittest.TestCase):
+
+	def test_import_is_light(self):
+		# a fresh interpreter in an empty directory, so that log/ would show up there
+		code = ("import sys, cachablesimulator, matchloader; "
+			"print(','.join(m for m in ['numpy', 'pymongo', 'batchsimulator', 'estimations'] if m in sys.modules))")
+		env = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.abspath(__file__)))
+		with tempfile.TemporaryDirectory() as cwd:
+			output = subprocess.run([sys.executable, "-c", code], cwd=cwd, env=env, capture_output=True, text=True, check=True)
+			self.assertEqual(output.stdout.strip(), "")
+			self.assertEqual(os.listdir(cwd), [])
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2018 by Instituto de Cálculo, http://www.ic.fcen.uba.ar/
+
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+# Coded by Saveliy Vasiliev for project 301060 (https://301060.exactas.uba.ar/)
+
+import os
+import random
+import shutil
+import tempfile
+import unittest
+import numpy as np
+import estimations as est
+import fixture_data as fd
+
+
+def _frequencies(goals1, goals2):
+	# frequency of each result of result_order among the drawn scores
+	codes = np.zeros(36, dtype=np.int64)
+	for k, (g1, g2) in enumerate(est.result_order):
+		codes[g1 * 6 + g2] = k
+	return np.bincount(codes[goals1.astype(np.int64) * 6 + goals2], minlength=len(est.result_order)) / len(goals1)
+
+
+def _follows(frequencies, probs, n):
+	# whether every frequency is within 5 standard errors of its probability
+	return np.all(np.abs(frequencies - probs) <= 5 * np.sqrt(probs * (1 - probs) / n) + 1e-9)
+
+
+class ScoreTableTest(unittest.TestCase):
+
+	def test_sample_follows_probs(self):
+		table = est.score_table()
+		n = 200000
+		u = np.random.default_rng(0).random(n)
+		bra, ger = fd.team_ids["BRA"], fd.team_ids["GER"]
+		self.assertTrue(_follows(_frequencies(*table.sample(bra, ger, u)), table.probs[bra, ger], n))
+		# the same pair given as arrays goes through the search over the whole table
+		teams1, teams2 = np.full(n, bra), np.full(n, ger)
+		self.assertTrue(_follows(_frequencies(*table.sample(teams1, teams2, u)), table.probs[bra, ger], n))
+
+	def test_rows_end_at_one(self):
+		cum = est.score_table().cum
+		self.assertTrue(np.all(cum[..., -1] == 1.0))
+		self.assertTrue(np.all(np.diff(cum, axis=2) >= 0))
+
+	def test_wins_are_complementary(self):
+		wins = est.winning_probs()
+		off_diagonal = ~np.eye(len(fd.teams), dtype=bool)
+		self.assertTrue(np.allclose((wins + wins.T)[off_diagonal], 1))
+
+	def test_largest_uniform_stays_in_its_row(self):
+		table = est.score_table()
+		n = len(fd.teams)
+		team1, team2 = np.divmod(np.arange(n * n), n)
+		u = np.full(n * n, np.nextafter(1.0, 0.0))
+		goals1, goals2 = table.sample(team1, team2, u)
+		last = est.result_order[-1]
+		self.assertTrue(np.all(goals1 == last[0]) and np.all(goals2 == last[1]))
+
+	def test_scan_goals_takes_any_uniform(self):
+		class Top(random.Random):
+			def uniform(self, a, b):
+				return np.nextafter(1.0, 0.0)
+		for team1 in range(len(fd.teams)):
+			for team2 in range(len(fd.teams)):
+				if team1 != team2:
+					self.assertIn(est._scan_goals(team1, team2, Top()), est.result_order)
+
+
+class AliasTableTest(unittest.TestCase):
+
+	def test_alias_sample_follows_probs(self):
+		table = est.alias_table()
+		n = 200000
+		u = np.random.default_rng(1).random(n)
+		for team1, team2 in [("BRA", "GER"), ("KSA", "RUS"), ("PAN", "ENG")]:
+			i, j = fd.team_ids[team1], fd.team_ids[team2]
+			self.assertTrue(_follows(_frequencies(*table.sample(np.full(n, i), np.full(n, j), u)), table.probs[i, j], n))
+
+	def test_alias_draw_follows_probs(self):
+		table = est.alias_table()
+		n = 50000
+		rng = random.Random(2)
+		i, j = fd.team_ids["ARG"], fd.team_ids["CRO"]
+		goals = np.array([table.draw(i, j, rng.random(), rng.random()) for _ in range(n)])
+		self.assertTrue(_follows(_frequencies(goals[:, 0], goals[:, 1]), table.probs[i, j], n))
+
+
+class EstimationTableTest(unittest.TestCase):
+
+	def setUp(self):
+		self._dir = tempfile.mkdtemp()
+		self._path = os.path.join(self._dir, "estimations")
+
+	def tearDown(self):
+		shutil.rmtree(self._dir)
+
+	def test_binary_table_matches_data(self):
+		self.assertTrue(np.allclose(est.table().probs, est.table_from_data().probs, rtol=0, atol=1e-12))
+
+	def test_save_and_load(self):
+		table = est.table_from_data()
+		table.save(self._path)
+		loaded = est.load_table(self._path)
+		self.assertEqual(loaded.teams, fd.teams)
+		self.assertTrue(np.array_equal(loaded.probs, table.probs))
+		self.assertTrue(np.array_equal(loaded.row("RUS", "KSA"), table.row("RUS", "KSA")))
+
+	def test_load_reorders_teams(self):
+		table = est.table_from_data()
+		order = list(range(len(fd.teams)))[::-1]
+		est.EstimationTable([fd.teams[k] for k in order], table.probs[np.ix_(order, order)]).save(self._path)
+		self.assertTrue(np.array_equal(est.load_table(self._path).probs, table.probs))
+
+	def test_load_needs_every_team(self):
+		table = est.table_from_data()
+		est.EstimationTable(fd.teams[1:], table.probs[1:, 1:]).save(self._path)
+		with self.assertRaises(ValueError):
+			est.load_table(self._path)
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2018 by Instituto de Cálculo, http://www.ic.fcen.uba.ar/
+
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+# Coded by Saveliy Vasiliev for project 301060 (https://301060.exactas.uba.ar/)
+
+import itertools
+import unittest
+import estimations as est
+import exactgroup as eg
+import fixture_data as fd
+import group
+import match
+
+
+KNOWN = [match.Match("RUS", "KSA", 5, 0), match.Match("EGY", "URU", 0, 1),
+	match.Match("RUS", "EGY", 3, 1), match.Match("URU", "KSA", 1, 0)]
+
+
+def _enumerated_positions(gname, known):
+	# team -> position -> probability, going through every result of the pending matches
+	table = est.score_table()
+	teams = fd.groups[gname]
+	pending = [sorted(pair) for pair in fd.group_pairs[gname]
+		if not any({m.team1, m.team2} == set(pair) for m in known)]
+	probs = dict((team, dict((str(pos + 1), 0.0) for pos in range(4))) for team in teams)
+	for results in itertools.product(range(len(est.result_order)), repeat=len(pending)):
+		weight = 1.0
+		scores = [m.score() for m in known]
+		for (team1, team2), r in zip(pending, results):
+			weight *= table.probs[fd.team_ids[team1], fd.team_ids[team2], r]
+			scores.append({team1: est.result_order[r][0], team2: est.result_order[r][1]})
+		totals = dict((team, [0, 0, 0]) for team in teams)
+		for score in scores:
+			(team1, goals1), (team2, goals2) = score.items()
+			for team, scored, conceded in [(team1, goals1, goals2), (team2, goals2, goals1)]:
+				totals[team][0] += 3 * (scored > conceded) + (scored == conceded)
+				totals[team][1] += scored - conceded
+				totals[team][2] += scored
+		keys = dict((team, group.sort_key(*totals[team])) for team in teams)
+		for team in teams:
+			better = sum(keys[other] > keys[team] for other in teams)
+			tied = sum(keys[other] == keys[team] for other in teams)
+			for pos in range(better, better + tied):
+				probs[team][str(pos + 1)] += weight / tied
+	return probs
+
+
+class ExactGroupStageTest(unittest.TestCase):
+
+	def test_matches_enumeration(self):
+		stage = eg.ExactGroupStage(KNOWN, groups=["A"])
+		self.assertTrue(stage.is_exact("A"))
+		expected = _enumerated_positions("A", KNOWN)
+		for team, probs in stage.probs_group_position()["A"].items():
+			for pos, p in probs.items():
+				self.assertAlmostEqual(p, expected[team][pos], places=12, msg=(team, pos))
+
+	def test_rankings_add_up_to_positions(self):
+		stage = eg.ExactGroupStage(KNOWN, groups=["A"])
+		self.assertAlmostEqual(sum(stage.probs_ranking()["A"].values()), 1)
+		for team, probs in stage.probs_group_position()["A"].items():
+			for pos, p in probs.items():
+				from_rankings = sum(q for ranking, q in stage.probs_ranking()["A"].items() if ranking[int(pos) - 1] == team)
+				self.assertAlmostEqual(p, from_rankings, places=12)
+
+	def test_sampled_groups_are_close(self):
+		stage = eg.ExactGroupStage(KNOWN[:3], max_outcomes=36 ** 2, samples=100000, seed=0, groups=["A"])
+		self.assertFalse(stage.is_exact("A"))
+		exact = eg.ExactGroupStage(KNOWN[:3], groups=["A"])
+		for team, probs in stage.probs_group_position()["A"].items():
+			for pos, p in probs.items():
+				self.assertAlmostEqual(p, exact.probs_group_position()["A"][team][pos], delta=0.01)
+
+	def test_rankings_only(self):
+		exact = eg.ExactGroupStage(KNOWN[:3], groups=["A"]).probs_ranking()["A"]
+		self.assertEqual(eg.ExactGroupStage(KNOWN[:3], groups=["A"], rankings_only=True).probs_ranking()["A"], exact)
+		sampled = eg.ExactGroupStage(KNOWN[:3], max_outcomes=36 ** 2, samples=100000, seed=0, groups=["A"],
+			rankings_only=True).probs_ranking()["A"]
+		self.assertAlmostEqual(sum(sampled.values()), 1)
+		for ranking in set(exact) | set(sampled):
+			self.assertAlmostEqual(sampled.get(ranking, 0), exact.get(ranking, 0), delta=0.01)
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2018 by Instituto de Cálculo, http://www.ic.fcen.uba.ar/
+
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+# Coded by Saveliy Vasiliev for project 301060 (https://301060.exactas.uba.ar/)
+
+import random
+import unittest
+import numpy as np
+import batchsimulator as bsim
+import estimations as est
+import exactknockout as ek
+import fixture_data as fd
+import match
+
+
+def _known_matches(per_group, seed=0):
+	# the first per_group matches of every group, with scores drawn with seed
+	rng = random.Random(seed)
+	group_matches = []
+	for gname in sorted(fd.groups):
+		for team1, team2 in sorted(sorted(pair) for pair in fd.group_pairs[gname])[:per_group]:
+			score = est.random_score(team1, team2, rng)
+			group_matches.append(match.Match(team1, team2, score[team1], score[team2]))
+	return group_matches
+
+
+class ExactKnockoutTest(unittest.TestCase):
+
+	def test_matches_batch_simulator(self):
+		iterations = 100000
+		group_matches = _known_matches(4)
+		exact = ek.ExactKnockout(group_matches)
+		simulated = bsim.BatchSimulator(group_matches, {}, iterations, seed=0, verbose=False)
+		for name in ["probs_champion", "probs_second", "probs_third"]:
+			exact_probs, simulated_probs = getattr(exact, name)(), getattr(simulated, name)()
+			self.assertAlmostEqual(sum(exact_probs.values()), 1)
+			for team in fd.teams:
+				p = exact_probs[team]
+				# 5 standard errors of the plain estimate, Rao-Blackwell only narrows them
+				self.assertLess(abs(simulated_probs[team] - p), 5 * np.sqrt(p * (1 - p) / iterations) + 1e-9, (name, team))
+
+
+if __name__ == '__main__':
+	unittest.main()
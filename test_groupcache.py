@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2018 by Instituto de Cálculo, http://www.ic.fcen.uba.ar/
+
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+# Coded by Saveliy Vasiliev for project 301060 (https://301060.exactas.uba.ar/)
+
+import unittest
+import exactgroup as eg
+import exactknockout as ek
+import fixture_data as fd
+import groupcache as gc
+import match
+from test_exactknockout import _known_matches
+
+
+class GroupCacheTest(unittest.TestCase):
+
+	def test_group_key(self):
+		key = gc.group_key("A", [match.Match("RUS", "KSA", 5, 0), match.Match("EGY", "URU", 0, 1)])
+		self.assertEqual(key, "A:EGY-URU:0-1,KSA-RUS:0-5")
+		# other groups, order and orientation don't change it
+		self.assertEqual(gc.group_key("A", [match.Match("URU", "EGY", 1, 0), match.Match("ESP", "POR", 3, 3),
+			match.Match("KSA", "RUS", 0, 5)]), key)
+		self.assertEqual(gc.group_key("B", [match.Match("RUS", "KSA", 5, 0)]), "B:")
+		with self.assertRaises(ValueError):
+			gc.group_key("A", [match.Match("RUS", "KSA")])
+
+	def test_solve_group(self):
+		group_matches = _known_matches(4)
+		rankings, exact = gc.solve_group("A", group_matches, 1000)
+		self.assertTrue(exact)
+		expected = eg.ExactGroupStage(group_matches, groups=["A"]).probs_ranking()["A"]
+		self.assertEqual(rankings, dict((",".join(ranking), p) for ranking, p in expected.items()))
+
+	def test_blocks_give_the_exact_knockout(self):
+		group_matches = _known_matches(4)
+		blocks = gc.GroupBlocks(dict((gname, gc.solve_group(gname, group_matches, 1000)[0]) for gname in fd.groups))
+		cached = ek.ExactKnockout(group_matches, group_stage=blocks)
+		direct = ek.ExactKnockout(group_matches)
+		for team, p in direct.probs_champion().items():
+			self.assertAlmostEqual(cached.probs_champion()[team], p, places=12)
+
+
+if __name__ == '__main__':
+	unittest.main()
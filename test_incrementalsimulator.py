@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2018 by Instituto de Cálculo, http://www.ic.fcen.uba.ar/
+
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+# Coded by Saveliy Vasiliev for project 301060 (https://301060.exactas.uba.ar/)
+
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+import numpy as np
+import batchsimulator as bsim
+import fixture_data as fd
+import incrementalsimulator as isim
+import match
+import tournamentstate as ts
+
+
+KNOWN = [match.Match("RUS", "KSA", 5, 0), match.Match("EGY", "URU", 0, 1)]
+
+
+class IncrementalSimulatorTest(unittest.TestCase):
+
+	def setUp(self):
+		self._dir = tempfile.mkdtemp()
+		self._outcomes = os.path.join(self._dir, "outcomes.npz")
+
+	def tearDown(self):
+		shutil.rmtree(self._dir)
+
+	def _saved(self, simulator=None):
+		# the arrays of the outcomes file, or of what simulator saves
+		path = self._outcomes
+		if simulator is not None:
+			path = os.path.join(self._dir, "saved.npz")
+			simulator.save(path)
+		with np.load(path) as outcomes:
+			return dict(outcomes)
+
+	def assertClose(self, conditioned, direct, n):
+		# champion and group A probabilities within Monte Carlo error of a direct simulation
+		pairs = [(conditioned.probs_champion()[team], direct.probs_champion()[team]) for team in fd.teams]
+		pairs += [(conditioned.probs_group_position()["A"][team][pos], direct.probs_group_position()["A"][team][pos])
+			for team in fd.groups["A"] for pos in "1234"]
+		for p1, p2 in pairs:
+			p = (p1 + p2) / 2
+			self.assertLess(abs(p1 - p2), 5 * np.sqrt(2 * p * (1 - p) / n) + 1e-9)
+
+	def test_condition_matches_direct_simulation(self):
+		n = 100000
+		incremental = isim.IncrementalSimulator([], {}, n, seed=0, verbose=False)
+		incremental.condition(KNOWN, {})
+		self.assertEqual(incremental.iterations(), n)
+		self.assertClose(incremental, bsim.BatchSimulator(KNOWN, {}, n, seed=1, verbose=False), n)
+
+	def test_loads_saved_iterations(self):
+		n = 20000
+		isim.IncrementalSimulator(KNOWN[:1], {}, n, seed=0, verbose=False).save(self._outcomes)
+		loaded = isim.IncrementalSimulator(KNOWN, {}, n, seed=1, verbose=False, outcomes=self._outcomes)
+		# the iterations of the file were conditioned, not drawn again: only group A changes
+		self.assertTrue(np.array_equal(self._saved(loaded)["rankings"][:, 1:], self._saved()["rankings"][:, 1:]))
+
+	def test_dropped_result_starts_from_scratch(self):
+		n = 100000
+		isim.IncrementalSimulator(KNOWN[:1], {}, n, seed=0, verbose=False).save(self._outcomes)
+		loaded = isim.IncrementalSimulator([], {}, n, seed=1, verbose=False, outcomes=self._outcomes)
+		self.assertClose(loaded, bsim.BatchSimulator([], {}, n, seed=2, verbose=False), n)
+
+	def test_other_tables_start_from_scratch(self):
+		n = 1000
+		isim.IncrementalSimulator(KNOWN, {}, n, seed=0, verbose=False).save(self._outcomes)
+		with mock.patch.object(ts, "tables_digest", lambda: "other"):
+			loaded = isim.IncrementalSimulator(KNOWN, {}, n, seed=1, verbose=False, outcomes=self._outcomes)
+			self.assertFalse(np.array_equal(self._saved(loaded)["goals"], self._saved()["goals"]))
+
+	def test_condition_rejects_dropped_results(self):
+		incremental = isim.IncrementalSimulator(KNOWN, {}, 1000, seed=0, verbose=False)
+		with self.assertRaises(ValueError):
+			incremental.condition(KNOWN[:1], {})
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2018 by Instituto de Cálculo, http://www.ic.fcen.uba.ar/
+
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+# Coded by Saveliy Vasiliev for project 301060 (https://301060.exactas.uba.ar/)
+
+import pickle
+import unittest
+import match
+
+
+class MatchTest(unittest.TestCase):
+
+	def test_played_match_pickles(self):
+		played = match.Match("RUS", "KSA", 5, 0)
+		played.winner()
+		copy = pickle.loads(pickle.dumps(played))
+		self.assertEqual(copy.score(), {"RUS": 5, "KSA": 0})
+		self.assertEqual(hash(copy), hash(played))
+
+	def test_digest_is_stable(self):
+		# stored cache keys depend on it, so it must not change across runs or versions
+		self.assertEqual(match.Match("RUS", "KSA", 5, 0).digest(),
+			"0fb06b855d4999118dd2a1712f8279a9c5bac65e15132f9a99e97f3c4c60fecf")
+		self.assertEqual(hash(match.Match("RUS", "KSA", 5, 0)), int("0fb06b855d499911", 16))
+
+	def test_digest_ignores_orientation(self):
+		self.assertEqual(match.Match("RUS", "KSA", 5, 0).digest(), match.Match("KSA", "RUS", 0, 5).digest())
+		self.assertNotEqual(match.Match("RUS", "KSA", 5, 0).digest(), match.Match("RUS", "KSA", 0, 5).digest())
+
+	def test_digest_of_knockout_matches(self):
+		por = match.Match("POR", "URU", 1, 1, winner="POR", knockout=True)
+		uru = match.Match("POR", "URU", 1, 1, winner="URU", knockout=True)
+		self.assertNotEqual(por.digest(), uru.digest())
+		self.assertNotEqual(por.digest(), match.Match("POR", "URU", 1, 1).digest())
+		self.assertNotEqual(por.digest(), match.Match("POR", "URU", 1, 1, winner="POR", knockout=True, id=3).digest())
+
+	def test_unplayed_match_has_no_digest(self):
+		unplayed = match.Match("RUS", "KSA")
+		with self.assertRaises(ValueError):
+			unplayed.digest()
+		with self.assertRaises(ValueError):
+			hash(unplayed)
+
+
+if __name__ == '__main__':
+	unittest.main()
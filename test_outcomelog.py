@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2018 by Instituto de Cálculo, http://www.ic.fcen.uba.ar/
+
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+# Coded by Saveliy Vasiliev for project 301060 (https://301060.exactas.uba.ar/)
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+import numpy as np
+import batchsimulator as bsim
+import bracket
+import config
+import fixture_data as fd
+import outcomelog
+import simulator as sim
+
+
+class OutcomeBlockTest(unittest.TestCase):
+
+	def _blocks(self, engine):
+		blocks = []
+		engine([], {}, 50, seed=0, verbose=False, batch_callbacks=[blocks.append])
+		return blocks
+
+	def test_engines_give_the_same_dtype(self):
+		for engine in [sim.Simulator, bsim.BatchSimulator]:
+			block = self._blocks(engine)[0]
+			for name in ["rankings", "group_goals", "knockout_goals", "knockout", "losers"]:
+				self.assertEqual(getattr(block, name).dtype, np.int8, (engine.__name__, name))
+
+
+class OutcomeLogTest(unittest.TestCase):
+
+	def setUp(self):
+		self._dir = tempfile.mkdtemp()
+
+	def tearDown(self):
+		shutil.rmtree(self._dir)
+
+	def _run(self, n, seed):
+		# BatchSimulator of n iterations logged to the directory, with the blocks it handed out
+		blocks = []
+		simulator = bsim.BatchSimulator([], {}, n, block_size=400, seed=seed, verbose=False,
+			outcome_log=self._dir, batch_callbacks=[blocks.append])
+		return simulator, blocks
+
+	def test_round_trip(self):
+		with mock.patch.object(config, "rao_blackwell", False):
+			simulator, blocks = self._run(1000, 0)
+		log = outcomelog.OutcomeLog(self._dir)
+		self.assertEqual(log.iterations, 1000)
+		for name in outcomelog.columns:
+			self.assertTrue(np.array_equal(getattr(log, name), np.concatenate([getattr(b, name) for b in blocks])), name)
+		champions = np.bincount(log.knockout[:, len(bracket.wiring) - 1], minlength=len(fd.teams)) / log.iterations
+		for team, p in simulator.probs_champion().items():
+			self.assertAlmostEqual(champions[fd.team_ids[team]], p)
+
+	def test_runs_are_appended(self):
+		self._run(500, 0)
+		self._run(300, 1)
+		self.assertEqual(outcomelog.OutcomeLog(self._dir).iterations, 800)
+
+	def test_other_layout_is_rejected(self):
+		self._run(10, 0)
+		meta_path = os.path.join(self._dir, "meta.json")
+		with open(meta_path) as f:
+			meta = json.load(f)
+		meta["teams"] = meta["teams"][::-1]
+		with open(meta_path, "w") as f:
+			json.dump(meta, f)
+		with self.assertRaises(ValueError):
+			outcomelog.OutcomeWriter(self._dir)
+
+
+if __name__ == '__main__':
+	unittest.main()
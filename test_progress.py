@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2018 by Instituto de Cálculo, http://www.ic.fcen.uba.ar/
+
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+# Coded by Saveliy Vasiliev for project 301060 (https://301060.exactas.uba.ar/)
+
+import io
+import unittest
+from unittest import mock
+import config
+import progress
+
+
+class ProgressTest(unittest.TestCase):
+
+	def test_reports_are_throttled(self):
+		statuses = []
+		tracker = progress.Progress(progress.reporter(statuses.append), interval=3600)
+		for done in range(0, 1001, 10):
+			tracker.update(done, 1000)
+		# the first update and the last one, which always gets through
+		self.assertEqual([status.done for status in statuses], [0, 1000])
+		self.assertTrue(statuses[-1].finished)
+
+	def test_precision_is_only_computed_when_reporting(self):
+		calls = []
+		tracker = progress.Progress(progress.NoReporter(), interval=3600)
+		for done in range(1, 101):
+			tracker.update(done, 100, lambda: calls.append(done) or 0.01)
+		self.assertEqual(calls, [1, 100])
+
+	def test_bar(self):
+		stream = io.StringIO()
+		progress.Progress(progress.TerminalBar(stream), interval=0).update(10, 10, lambda: 0.5)
+		self.assertIn("100.00% (10 / 10)", stream.getvalue())
+		self.assertIn("+-0.5000", stream.getvalue())
+		self.assertTrue(stream.getvalue().endswith("DONE\r\n"))
+
+	def test_log_reporter_is_handled(self):
+		with self.assertLogs(progress.logger, "INFO") as logged:
+			progress.Progress(progress.reporter("log"), interval=0).update(10, 10)
+		self.assertIn("10 / 10 iterations", logged.output[0])
+		self.assertTrue(progress.logger.handlers)
+
+	def test_reporter_choice(self):
+		self.assertIsInstance(progress.reporter("bar", verbose=False), progress.NoReporter)
+		with mock.patch.object(config, "progress", "bar"), mock.patch("sys.stdout", io.StringIO()):
+			# not a terminal
+			self.assertIsInstance(progress.reporter(None), progress.LogReporter)
+			self.assertIsInstance(progress.reporter("bar"), progress.TerminalBar)
+
+
+if __name__ == '__main__':
+	unittest.main()
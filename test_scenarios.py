@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2018 by Instituto de Cálculo, http://www.ic.fcen.uba.ar/
+
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+# Coded by Saveliy Vasiliev for project 301060 (https://301060.exactas.uba.ar/)
+
+import unittest
+import fixture_data as fd
+import match
+import scenarios
+
+
+class PairedScenariosTest(unittest.TestCase):
+
+	def test_same_scenario_has_no_change(self):
+		paired = scenarios.PairedScenarios([([], {}), ([], {})], 20000, batches=10, seed=0, verbose=False)
+		for team, (delta, error) in paired.delta("probs_champion").items():
+			self.assertEqual((delta, error), (0, 0))
+
+	def test_delta_is_the_change_of_the_probabilities(self):
+		paired = scenarios.PairedScenarios([([], {}), ([match.Match("RUS", "KSA", 5, 0)], {})], 20000, batches=10,
+			seed=0, verbose=False)
+		before, after = paired.simulator(0), paired.simulator(1)
+		self.assertEqual(after.iterations(), 20000)
+		for team, (delta, error) in paired.delta("probs_champion").items():
+			self.assertAlmostEqual(delta, after.probs_champion()[team] - before.probs_champion()[team])
+		delta, error = paired.delta("probs_group_position")["A"]["KSA"]["1"]
+		self.assertLess(delta, 0)
+		self.assertGreater(error, 0)
+
+	def test_common_random_numbers(self):
+		# a result of group A doesn't change the draws of the other groups
+		paired = scenarios.PairedScenarios([([], {}), ([match.Match("RUS", "KSA", 5, 0)], {})], 5000, batches=5,
+			seed=1, verbose=False)
+		positions = [paired.simulator(s).probs_group_position() for s in range(2)]
+		for gname in fd.groups:
+			if gname != "A":
+				self.assertEqual(positions[0][gname], positions[1][gname])
+
+
+if __name__ == '__main__':
+	unittest.main()
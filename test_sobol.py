@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2018 by Instituto de Cálculo, http://www.ic.fcen.uba.ar/
+
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+# Coded by Saveliy Vasiliev for project 301060 (https://301060.exactas.uba.ar/)
+
+import unittest
+from unittest import mock
+import numpy as np
+import batchsimulator as bsim
+import config
+import fixture_data as fd
+import sobol
+
+
+class SobolStreamTest(unittest.TestCase):
+
+	def test_points_are_stratified(self):
+		stream = sobol.SobolStream(3, seed=0)
+		n = 1024
+		for _ in range(3):
+			u = stream.random(n)
+			self.assertTrue(np.all((0 <= u) & (u < 1)))
+			# each of the n intervals of width 1 / n holds one point of every coordinate
+			self.assertTrue(np.array_equal(np.sort(np.floor(u * n)), np.arange(n)))
+
+	def test_seed_reproduces(self):
+		first, second = sobol.SobolStream(4, seed=5), sobol.SobolStream(4, seed=5)
+		self.assertTrue(np.array_equal(first.random((2, 256)), second.random((2, 256))))
+		self.assertTrue(np.array_equal(first.random((2, 256)), second.random((2, 256))))
+
+	def test_draws_must_match_the_blocks(self):
+		stream = sobol.SobolStream(2, seed=0)
+		stream.random(64)
+		with self.assertRaises(ValueError):
+			stream.random((2, 64))
+
+	def test_batch_simulator_agrees(self):
+		n = 65536
+		with mock.patch.object(config, "qmc", True):
+			quasi = bsim.BatchSimulator([], {}, n, block_size=16384, seed=0, verbose=False).probs_champion()
+		pseudo = bsim.BatchSimulator([], {}, n, seed=1, verbose=False).probs_champion()
+		for team in fd.teams:
+			p = pseudo[team]
+			self.assertLess(abs(quasi[team] - p), 5 * np.sqrt(2 * p * (1 - p) / n) + 1e-9, team)
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2018 by Instituto de Cálculo, http://www.ic.fcen.uba.ar/
+
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+# Coded by Saveliy Vasiliev for project 301060 (https://301060.exactas.uba.ar/)
+
+import unittest
+from unittest import mock
+import match
+import tournamentstate as ts
+
+
+GROUP = [match.Match("RUS", "KSA", 5, 0), match.Match("EGY", "URU", 0, 1), match.Match("ESP", "POR", 3, 3)]
+KNOCKOUT = {"S1": match.Match("URU", "POR", 2, 1, knockout=True), "S2": match.Match("FRA", "ARG", 4, 3, knockout=True)}
+
+
+class TournamentStateTest(unittest.TestCase):
+
+	def test_order_and_orientation_dont_matter(self):
+		state = ts.TournamentState(GROUP, KNOCKOUT, 1000)
+		flipped = [match.Match(m.team2, m.team1, m.score()[m.team2], m.score()[m.team1]) for m in reversed(GROUP)]
+		knockout = dict(reversed(list(KNOCKOUT.items())))
+		knockout["S1"] = match.Match("POR", "URU", 1, 2, knockout=True)
+		self.assertEqual(ts.TournamentState(flipped, knockout, 1000).canonical(), state.canonical())
+		self.assertEqual(ts.TournamentState(flipped, knockout, 1000), state)
+
+	def test_ids_and_repeats_dont_matter(self):
+		with_ids = [match.Match(m.team1, m.team2, m.score()[m.team1], m.score()[m.team2], id=k) for k, m in enumerate(GROUP)]
+		state = ts.TournamentState(GROUP, {}, 1000)
+		self.assertEqual(ts.TournamentState(with_ids + GROUP[:1], {}, 1000).digest(), state.digest())
+
+	def test_results_and_settings_change_the_digest(self):
+		state = ts.TournamentState(GROUP, KNOCKOUT, 1000)
+		others = [ts.TournamentState(GROUP[:2], KNOCKOUT, 1000),
+			ts.TournamentState(GROUP[:2] + [match.Match("ESP", "POR", 3, 2)], KNOCKOUT, 1000),
+			ts.TournamentState(GROUP, {"S1": KNOCKOUT["S1"]}, 1000),
+			ts.TournamentState(GROUP, KNOCKOUT, 2000),
+			ts.TournamentState(GROUP, KNOCKOUT, 1000, tolerance=0.01, tracked=["probs_champion"])]
+		self.assertEqual(len(set(s.digest() for s in others + [state])), len(others) + 1)
+		with mock.patch.object(ts, "tables_digest", lambda: "other"):
+			self.assertNotEqual(ts.TournamentState(GROUP, KNOCKOUT, 1000).digest(), state.digest())
+
+	def test_tracked_only_counts_with_a_tolerance(self):
+		self.assertEqual(ts.TournamentState(GROUP, {}, 1000, tracked=["probs_champion"]).digest(),
+			ts.TournamentState(GROUP, {}, 1000).digest())
+		self.assertEqual(ts.TournamentState(GROUP, {}, 1000, 0.01, ["probs_third", "probs_champion"]).digest(),
+			ts.TournamentState(GROUP, {}, 1000, 0.01, ["probs_champion", "probs_third"]).digest())
+
+	def test_invalid_matches_are_rejected(self):
+		with self.assertRaises(ValueError):
+			ts.TournamentState([match.Match("RUS", "KSA")], {}, 1000)
+		with self.assertRaises(ValueError):
+			ts.TournamentState([match.Match("RUS", "KSA", 5, 0), match.Match("KSA", "RUS", 1, 0)], {}, 1000)
+
+
+if __name__ == '__main__':
+	unittest.main()
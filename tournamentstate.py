@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2018 by Instituto de Cálculo, http://www.ic.fcen.uba.ar/
+
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+# Coded by Saveliy Vasiliev for project 301060 (https://301060.exactas.uba.ar/)
+
+import hashlib
+import json
+import os
+import config
+
+
+class TournamentState(object):
+	"""
+	Everything the result of a simulation depends on, in canonical form:
+	- group_results: sorted (team1, team2, goals1, goals2) of the known group
+	  matches, team1 being the first code (whatever the order the match was given in).
+	- knockout_results: sorted (slot, team1, team2, goals1, goals2, winner) of the
+	  known knockout matches, also with the teams in order.
+	- settings: iterations, tolerance and tracked (only with a tolerance).
+	- tables: digest of the estimated probabilities (see tables_digest).
+	Match ids are left out, they don't change the simulation. digest() is the cache
+	key of CachableSimulator: states are equal exactly when their digests are.
+	"""
+	def __init__(self, group_matches, knockout_matches, iterations, tolerance=None, tracked=()):
+		"""
+		group_matches: the known group matches, in any order.
+		knockout_matches: {slot: match} of the known knockout matches.
+		Unplayed matches raise ValueError.
+		"""
+		self.group_results = tuple(sorted(set(_result(m) for m in group_matches)))
+		pairs = [result[:2] for result in self.group_results]
+		if len(set(pairs)) < len(pairs):
+			raise ValueError("Two different results of the same group match were given.")
+		self.knockout_results = tuple(sorted((slot,) + _result(m) + (m.winner(),) for slot, m in knockout_matches.items()))
+		self.settings = {"iterations": iterations, "tolerance": tolerance,
+			"tracked": sorted(tracked) if tolerance is not None else None}
+		self.tables = tables_digest()
+		self._digest = None
+
+	def canonical(self):
+		"""
+		The state serialized as JSON, with sorted keys and no spaces.
+		"""
+		return json.dumps({"group": self.group_results, "knockout": self.knockout_results,
+			"settings": self.settings, "tables": self.tables}, sort_keys=True, separators=(",", ":"))
+
+	def digest(self):
+		# SHA-256 (hex) of canonical()
+		if self._digest is None:
+			self._digest = hashlib.sha256(self.canonical().encode()).hexdigest()
+		return self._digest
+
+	def __eq__(self, other):
+		return isinstance(other, TournamentState) and self.digest() == other.digest()
+
+	def __hash__(self):
+		return hash(self.digest())
+
+	def __str__(self):
+		return "TournamentState <{}>".format(self.digest())
+
+
+def _result(m):
+	# (team1, team2, goals1, goals2) of the played match m, with its teams in order.
+	# digest() raises ValueError for unplayed matches, which score() would play.
+	m.digest()
+	score = m.score()
+	team1, team2 = sorted([m.team1, m.team2])
+	return (team1, team2, score[team1], score[team2])
+
+
+_tables_digests = {}
+
+def tables_digest():
+	"""
+	SHA-256 (hex) of the files the estimated probabilities are loaded from (see
+	estimations.table), computed once per version of the files. It doesn't need
+	estimations, which loads NumPy.
+	"""
+	# the same path as estimations.table_path()
+	path = os.path.join(os.path.dirname(os.path.abspath(__file__)), config.estimations_file)
+	files = [path + ".npy", path + ".teams"]
+	if not os.path.exists(files[0]):
+		files = [os.path.join(os.path.dirname(os.path.abspath(__file__)), "estimations_data.py")]
+	version = tuple((f, os.stat(f).st_mtime_ns, os.stat(f).st_size) for f in files)
+	if version not in _tables_digests:
+		digest = hashlib.sha256()
+		for f in files:
+			with open(f, "rb") as data:
+				digest.update(data.read())
+		_tables_digests[version] = digest.hexdigest()
+	return _tables_digests[version]
+
+
+if __name__ == '__main__':
+	import match
+	state = TournamentState([match.Match("RUS", "KSA", 5, 0), match.Match("URU", "EGY", 1, 0)], {}, config.iterations)
+	print(state.canonical())
+	print(state)
+	same = TournamentState([match.Match("EGY", "URU", 0, 1), match.Match("RUS", "KSA", 5, 0, id="1")], {}, config.iterations)
+	print("Equal states: {}".format(state == same))